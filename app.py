@@ -1,29 +1,59 @@
 import httpx
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-import shutil
-import difflib
-import re
+from typing import List, Optional
 import json
-import requests
+from pydantic import BaseModel
 
 from fastapi.staticfiles import StaticFiles
-from starlette.responses import JSONResponse, StreamingResponse
+from starlette.responses import JSONResponse, StreamingResponse, PlainTextResponse
 
-from services.resume_ingest import process_resume_file
+from services.resume_ingest import process_resume_file, save_upload
 from services.jobs import list_jobs, get_job
-from db.db import upsert_candidate, get_candidate_by_id, query_candidates
-from chroma.chroma_store import add_or_update_candidate, search as vector_search
-from config.config_loader import CONFIG, SKILLS_DICT
+from services.search import search_candidates as run_search, search_batch, batch_items, resolve_mode
+from services.job_matcher import update_matches_for_candidate, ensure_job_matches, get_matches
+from services.reindex import start_reindex, reindex_status
+from services.parser_artifacts import reload_async, reload_status, start_watcher
+from services.dedupe import ingest_candidate
+from services.tombstones import delete_candidate, start_compaction, compaction_status
+from db.db import list_duplicates, get_candidate_by_id, get_cached_embedding, cache_embedding
+from chroma.chroma_store import add_or_update_candidate, live_model_name
+from config.config_loader import CONFIG, section
+from services.metrics import timed, inc, render_prometheus
+from services.profiler import (profiled, should_profile, mark_request, reset_request,
+                               list_profiles, get_profile_path)
 
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-TMP_DIR = Path("uploads")
+TMP_DIR = Path(section("uploads").get("directory", "uploads"))
 TMP_DIR.mkdir(exist_ok=True)
 templates = Jinja2Templates(directory="templates")
+FORM_SLACK = 64 * 1024  # multipart boundaries + the small text fields sent along with the resume
+
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    # only flags the request; endpoints decorated with @profiled do the actual profiling
+    token = mark_request(should_profile(request))
+    try:
+        return await call_next(request)
+    finally:
+        reset_request(token)
+
+
+@app.middleware("http")
+async def upload_size_middleware(request: Request, call_next):
+    # Starlette spools the whole multipart body before the endpoint runs, so an oversized upload is
+    # refused here from its Content-Length; save_upload still enforces max_bytes for chunked bodies
+    if request.method == "POST" and request.url.path.startswith("/apply/"):
+        max_bytes = section("uploads").get("max_bytes")
+        length = request.headers.get("content-length")
+        if max_bytes and length and length.isdigit() and int(length) > max_bytes + FORM_SLACK:
+            return JSONResponse({"detail": f"upload exceeds {max_bytes} bytes"}, status_code=413)
+    return await call_next(request)
 
 
 # -------------------- Routes --------------------
@@ -37,12 +67,32 @@ async def recruiter(request: Request):
     return templates.TemplateResponse("search.html", {"request": request})
 
 
+@app.on_event("startup")
+def build_job_matches():
+    ensure_job_matches()
+
+
+@app.on_event("startup")
+def watch_config():
+    if (CONFIG.get("reload", {}) or {}).get("watch", False):
+        start_watcher()
+
+
 @app.get("/jobs")
 def jobs():
     return {"jobs": list_jobs()}
 
 
+@app.get("/jobs/{job_id}/matches")
+def job_matches(job_id: str, limit: int = None):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    return {"job": job, "matches": get_matches(job_id, limit)}
+
+
 @app.post("/apply/{job_id}")
+@profiled
 async def apply(job_id: str,
                 file: UploadFile = File(...),
                 name: str = Form(...),
@@ -53,11 +103,20 @@ async def apply(job_id: str,
     if not job:
         raise HTTPException(status_code=404, detail="job not found")
 
-    tmp = TMP_DIR / file.filename
-    with open(tmp, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    # unique temp name per upload (no collisions on same filename); hash computed while streaming
+    upload_cfg = section("uploads")
+    try:
+        tmp, file_hash, _ = save_upload(file.file, TMP_DIR,
+                                        suffix=Path(file.filename or "").suffix.lower(),
+                                        max_bytes=upload_cfg.get("max_bytes"),
+                                        chunk_size=upload_cfg.get("chunk_size", 65536))
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    candidate = process_resume_file(tmp, filename=file.filename)
+    try:
+        candidate = process_resume_file(tmp, filename=file.filename, file_hash=file_hash)
+    finally:
+        tmp.unlink(missing_ok=True)
     candidate.update({
         "name": name.strip(),
         "email": email.strip(),
@@ -65,302 +124,138 @@ async def apply(job_id: str,
         "experience": experience
     })
 
-    cid, is_new = upsert_candidate(candidate)
-    add_or_update_candidate(cid, candidate["raw_text"],
-                            metadata={"name": candidate["name"], "email": candidate["email"]})
-    tmp.unlink(missing_ok=True)
-    return {"job_applied": job, "resume": candidate, "candidate_id": cid, "is_new": is_new}
-
-
-# -------------------- Helpers --------------------
-def normalize_skill(skill):
-    if not skill:
-        return None
-    skill_lower = str(skill).lower().strip()
-    norm_map = SKILLS_DICT.get("normalization_map", {}) or {}
-    if skill_lower in norm_map:
-        return norm_map[skill_lower]
-    known = [s.lower() for s in SKILLS_DICT.get("skills", [])]
-    best = difflib.get_close_matches(skill_lower, known, n=1, cutoff=0.85)
-    if best:
-        idx = known.index(best[0])
-        return SKILLS_DICT["skills"][idx]
-    return skill.strip()
-
-
-def detect_explicit_years(nl: str):
-    if not nl:
-        return None, None
-    m = re.search(r'(\d{1,2})\s*\+\s*(?:years|yrs|year)?', nl)
-    if m:
-        return int(m.group(1)), 50  # treat "3+" as 3 to 50
-    m = re.search(r'(\d{1,2})\s*(?:years|yrs|year)', nl)
-    if m:
-        n = int(m.group(1))
-        return n, n
-    return None, None
-
-
-def map_seniority(nl_lower: str):
-    exp_map = CONFIG.get("experience_ranges", {})
-    for key in ["Fresher", "Junior", "Mid", "Senior", "Lead"]:
-        if key.lower() in nl_lower:
-            r = exp_map.get(key, {})
-            return key, r.get("min"), r.get("max")
-    return None, None, None
-
-
-# -------------------- Ollama parsing --------------------
-def build_ollama_prompt(nl: str):
-    return f"""
-You are a strict JSON generator. Given a recruiter's natural language query, output a single JSON
-object with keys: title, seniority, must_have (list), any_of (list), location, min_years (int or null), max_years (int or null), raw_query.
-If a field is missing, use null or [].
-Return ONLY the JSON object, nothing else.
-
-Query: \"{nl}\"
-"""
-
-
-def parse_nl_with_ollama(nl: str):
-    """
-    Call Ollama configured in CONFIG. Return a sanitized dict or None.
-    Handles streaming responses and non-stream responses; prints raw output for debug.
-    """
-    if not CONFIG.get("ollama", {}).get("enabled", False):
-        raise RuntimeError("Ollama disabled in config")
+    with timed("db_upsert"):
+        # exact (email / text hash) and near-duplicate (MinHash) resumes resolved per dedupe.policy
+        cid, is_new, duplicate = ingest_candidate(candidate)
+    model = live_model_name()
+    cached_vec = get_cached_embedding(file_hash, model)
+    inc("embedding_cache_hits" if cached_vec is not None else "embedding_cache_misses")
+    with timed("vector_write"):
+        vec = add_or_update_candidate(cid, candidate["raw_text"],
+                                      metadata={"name": candidate["name"], "email": candidate["email"]},
+                                      vector=cached_vec)
+    if cached_vec is None and live_model_name() == model:  # skip if a reindex swapped models mid-request
+        cache_embedding(file_hash, vec, model)
+    update_matches_for_candidate(cid, candidate, vec)
+    return {"job_applied": job, "resume": candidate, "candidate_id": cid, "is_new": is_new,
+            "duplicate": duplicate}
 
-    api_url = CONFIG["ollama"]["api_url"]
-    payload = {
-        "model": CONFIG["ollama"].get("model"),
-        "prompt": build_ollama_prompt(nl),
-        # use streaming when supported (some Ollama setups stream JSON chunks)
-        "stream": True,
-        "options": {"num_predict": 256}
-    }
 
+# -------------------- Search --------------------
+@app.get("/search_candidates")
+@profiled
+def search_candidates(query: str, mode: str = None):
     try:
-        resp = requests.post(api_url, json=payload, stream=True, timeout=20)
-        resp.raise_for_status()
-    except Exception as e:
-        # bubble up so caller can fallback
-        print(f"[OLLAMA] request failed: {e}")
-        return None
-
-    full_text = []
+        return run_search(query, mode=mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = []
+    job_ids: List[str] = []
+    all_open_jobs: bool = False
+    mode: Optional[str] = None
+
+
+@app.post("/search_batch")
+def search_batch_endpoint(req: BatchSearchRequest):
     try:
-        # Try streaming lines first (common with Ollama)
-        for raw in resp.iter_lines(decode_unicode=True):
-            if not raw:
-                continue
-            line = raw.strip()
-            # many Ollama streaming lines are JSON objects per-line; try parse
-            try:
-                j = json.loads(line)
-            except Exception:
-                # if not JSON, append as-is
-                full_text.append(line)
-                continue
-            # Ollama variants might use "response" or "text"
-            if isinstance(j, dict):
-                if "response" in j and isinstance(j["response"], str):
-                    full_text.append(j["response"])
-                elif "text" in j and isinstance(j["text"], str):
-                    full_text.append(j["text"])
-                elif "choices" in j and isinstance(j["choices"], list):
-                    # some variants use choices -> text
-                    for c in j["choices"]:
-                        if isinstance(c, dict) and "text" in c:
-                            full_text.append(c["text"])
-                # if a done flag exists, break
-                if j.get("done"):
-                    break
-            else:
-                # if j is not dict (unlikely), append raw
-                full_text.append(line)
-    except Exception:
-        # fall back to trying to read full body
-        try:
-            text_body = resp.text
-            full_text.append(text_body)
-        except Exception:
-            pass
+        mode = resolve_mode(req.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        items = batch_items(req.queries, req.job_ids, req.all_open_jobs)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"job not found: {e.args[0]}")
 
-    text_out = "".join(full_text).strip()
+    # one JSON object per line, flushed as each query's ranking finishes
+    def ndjson():
+        for res in search_batch(items, mode=mode):
+            yield json.dumps(res, default=str) + "\n"
 
-    if not text_out:
-        # no content
-        return None
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
-    # try to extract a JSON object from the returned text
-    m = re.search(r"\{[\s\S]*\}", text_out)
-    if m:
-        try:
-            parsed = json.loads(m.group(0))
-        except Exception:
-            parsed = None
-    else:
-        # maybe entire output was JSON string (non-stream)
-        try:
-            parsed = json.loads(text_out)
-        except Exception:
-            parsed = None
-
-    # sanitize parsed (normalize None -> empty lists/strings)
-    if not parsed or not isinstance(parsed, dict):
-        return None
-
-    # ensure keys exist and normalized
-    parsed_sanitized = {
-        "title": parsed.get("title") or None,
-        "seniority": parsed.get("seniority") or None,
-        "must_have": parsed.get("must_have") or [],
-        "any_of": parsed.get("any_of") or [],
-        "location": parsed.get("location") or None,
-        "min_years": parsed.get("min_years"),
-        "max_years": parsed.get("max_years"),
-        "raw_query": parsed.get("raw_query") or nl or ""
-    }
-    # ensure lists are lists
-    if parsed_sanitized["must_have"] is None:
-        parsed_sanitized["must_have"] = []
-    if parsed_sanitized["any_of"] is None:
-        parsed_sanitized["any_of"] = []
 
-    return parsed_sanitized
+# -------------------- Metrics --------------------
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 
-def fallback_parser(nl: str):
-    nl_lower = (nl or "").lower()
+# -------------------- Profiles (admin) --------------------
+@app.get("/admin/profiles")
+def admin_profiles():
+    return {"profiles": list_profiles()}
 
-    # normalize common seniority abbreviations
-    seniority_aliases = {
-        r"\bsr[\.\s]": "senior ",
-        r"\bjr[\.\s]": "junior ",
-        r"\bmid[\.\s]": "mid ",
-        r"\blead[\.\s]": "lead ",
-        r"\bfresher[\.\s]?": "fresher "
-    }
-    for pattern, replacement in seniority_aliases.items():
-        nl_lower = re.sub(pattern, replacement, nl_lower)
-
-    parsed = {
-        "title": None,
-        "seniority": None,
-        "must_have": [],
-        "any_of": [],
-        "location": None,
-        "min_years": None,
-        "max_years": None,
-        "raw_query": nl or ""
-    }
 
-    # seniority mapping
-    s, mn, mx = map_seniority(nl_lower)
-    if s:
-        parsed["seniority"] = s
-        parsed["min_years"], parsed["max_years"] = mn, mx
-
-    # explicit years override seniority ranges
-    ey_min, ey_max = detect_explicit_years(nl_lower)
-    if ey_min is not None:
-        parsed["min_years"], parsed["max_years"] = ey_min, ey_max
-
-    # skills
-    words = re.split(r'[\s,/;|]+', nl_lower)
-    seen = set()
-    for w in words:
-        if len(w) < 2:
-            continue
-        norm = normalize_skill(w)
-        if norm and norm not in seen:
-            seen.add(norm)
-            parsed["must_have"].append(norm)
-
-    # title
-    for t in ["developer", "engineer", "analyst", "manager", "architect"]:
-        if t in nl_lower:
-            parsed["title"] = t.title()
-            break
-
-    # location
-    for loc in CONFIG.get("cities", []) or []:
-        if loc and loc.lower() in nl_lower:
-            parsed["location"] = loc
-            break
-
-    return parsed
+@app.get("/admin/profiles/{name}")
+def admin_profile_download(name: str):
+    path = get_profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="profile not found")
+    # cProfile/pstats dump: open with `python -m pstats <file>` or snakeviz
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
 
 
-# -------------------- Search --------------------
-@app.get("/search_candidates")
-def search_candidates(query: str):
-    if not query or query.strip() == "":
-        return {"query": query, "results": [], "message": "Enter a valid query"}
+# -------------------- Re-embedding (admin) --------------------
+class ReindexRequest(BaseModel):
+    model: Optional[str] = None
+    resume: bool = True
 
-    try:
-        parsed = fallback_parser(query)
-    except Exception as e:
-        print(f"[OLLAMA] parse error: {e}")
-        parsed = None
-
-    if not parsed:
-        parsed = parse_nl_with_ollama(query)
-
-    # enforce filters
-    where_clauses, params = [], []
-
-    if parsed.get("location"):
-        where_clauses.append("LOWER(location) = LOWER(?)")
-        params.append(parsed["location"])
-
-    if parsed.get("min_years") is not None:
-        mn, mx = parsed.get("min_years"), parsed.get("max_years")
-        if mx is None:
-            mx = mn
-        where_clauses.append("CAST(experience AS INTEGER) BETWEEN ? AND ?")
-        params.extend([mn, mx])
-
-    sql_rows = query_candidates(" AND ".join(where_clauses), tuple(params)) if where_clauses else query_candidates()
-
-    # vector search
-    vec_results = vector_search(query, top_k=CONFIG.get("search", {}).get("vector_top_k", 50)) or []
-    vec_map = {v["id"]: float(v.get("score", 0.0)) for v in vec_results if isinstance(v, dict)}
-
-    must_skills = [normalize_skill(s).lower() for s in parsed.get("must_have") or []]
-
-    out = []
-    for r in sql_rows:
-        cand_skills = [normalize_skill(s).lower() for s in (r.get("skills") or [])]
-        skill_matches = len([m for m in must_skills if m in cand_skills])
-        skill_score = (skill_matches / len(must_skills)) if must_skills else 0.0
-        sem_score = vec_map.get(r["id"], 0.0)
-        exp_score = 0.0
-        if parsed.get("min_years") is not None:
-            try:
-                exp_val = int(r.get("experience") or 0)
-                mn, mx = parsed.get("min_years"), parsed.get("max_years") or parsed.get("min_years")
-                exp_score = 1.0 if mn <= exp_val <= mx else 0.0
-            except Exception:
-                pass
-        final_score = (
-                CONFIG["scoring"].get("semantic_weight", 0.5) * sem_score +
-                CONFIG["scoring"].get("skill_weight", 0.3) * skill_score +
-                CONFIG["scoring"].get("experience_weight", 0.2) * exp_score
-        )
-        if CONFIG["filters"].get("enforce_must_have", True) and must_skills and skill_matches == 0:
-            continue
-        out.append({"candidate": r, "semantic": sem_score, "skill_score": skill_score,
-                    "exp_score": exp_score, "final_score": final_score})
 
-    if not out:
-        return {"query": query, "results": [], "message": "No results found. Please refine your search."}
+@app.post("/admin/reindex")
+def admin_reindex(req: ReindexRequest):
+    # builds the next index generation in the background; searches keep using the live one until the swap
+    if not start_reindex(req.model, req.resume):
+        raise HTTPException(status_code=409, detail="re-embedding already running")
+    return JSONResponse(reindex_status(), status_code=202)
 
-    out = sorted(out, key=lambda x: x["final_score"], reverse=True)
-    max_score = max([o["final_score"] for o in out] or [1.0])
-    for o in out:
-        o["match_percent"] = round((o["final_score"] / max_score) * 100, 2)
-    return {"query": query, "results": out}
+
+@app.get("/admin/reindex")
+def admin_reindex_status():
+    return reindex_status()
+
+
+# -------------------- Delete --------------------
+@app.delete("/candidate/{candidate_id}")
+def candidate_delete(candidate_id: str):
+    # tombstoned: hidden from search/details at once, files rewritten by background compaction
+    if not delete_candidate(candidate_id):
+        raise HTTPException(status_code=404, detail="Candidate not found")
+    return {"candidate_id": candidate_id, "deleted": True}
+
+
+@app.post("/admin/compact")
+def admin_compact():
+    if not start_compaction():
+        raise HTTPException(status_code=409, detail="compaction already running")
+    return JSONResponse(compaction_status(), status_code=202)
+
+
+@app.get("/admin/compact")
+def admin_compact_status():
+    return compaction_status()
+
+
+# -------------------- Duplicates (admin) --------------------
+@app.get("/admin/duplicates")
+def admin_duplicates(policy: str = None):
+    # near-duplicate pairs recorded at ingest or by dedupe.py (policy "link" or "flag")
+    return {"duplicates": list_duplicates(policy)}
+
+
+# -------------------- Config reload (admin) --------------------
+@app.post("/admin/reload")
+def admin_reload():
+    # re-reads config.yml + skills_dict.json and swaps the parser artifacts; requests never wait on it
+    reload_async()
+    return JSONResponse(reload_status(), status_code=202)
+
+
+@app.get("/admin/reload")
+def admin_reload_status():
+    return reload_status()
 
 
 # -------------------- Candidate Details --------------------
@@ -425,6 +320,7 @@ def build_ollama_summary_prompt(candidate: dict) -> str:
 
 
 @app.get("/candidate_ai/{cid}")
+@profiled
 async def candidate_ai(cid: str):
     # 1. Fetch candidate basic details first
     candidate = get_candidate_by_id(cid)  # your existing DB/service function
@@ -443,6 +339,8 @@ async def candidate_ai(cid: str):
         "options": {"num_predict": 256},
     }
 
+    inc("llm_calls")
+
     async def event_stream():
         # Yield candidate’s static details first (so frontend shows them immediately)
         static_text = (
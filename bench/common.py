@@ -0,0 +1,64 @@
+# bench/common.py
+import json
+import math
+import platform
+import time
+from datetime import datetime
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(sorted_vals, pct):
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_vals:
+        return None
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(pct / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+def summarize(samples_s):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    vals = sorted(s * 1000.0 for s in samples_s)
+    if not vals:
+        return {"n": 0}
+    return {
+        "n": len(vals),
+        "mean_ms": round(sum(vals) / len(vals), 4),
+        "min_ms": round(vals[0], 4),
+        "p50_ms": round(percentile(vals, 50), 4),
+        "p95_ms": round(percentile(vals, 95), 4),
+        "p99_ms": round(percentile(vals, 99), 4),
+        "max_ms": round(vals[-1], 4),
+    }
+
+
+def run_timed(fn, args_list, warmup=1):
+    """Call fn(*args) for each args tuple and return the per-call durations in seconds."""
+    for args in args_list[:warmup]:
+        fn(*args)
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def write_results(kind: str, results: dict, out=None):
+    """Write a results document as JSON (bench/results/<timestamp>_<kind>.json by default)."""
+    doc = {
+        "kind": kind,
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if out is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        out = RESULTS_DIR / f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{kind}.json"
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(doc, indent=2), encoding="utf-8")
+    print(f"Results written to {out}")
+    return out
@@ -0,0 +1,37 @@
+# bench/compare.py
+# Compare two benchmark result files (same kind) side by side.
+#
+#   python -m bench.compare bench/results/A_micro.json bench/results/B_micro.json
+import argparse
+import json
+from pathlib import Path
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def _sections(doc):
+    res = doc.get("results", {})
+    return res.get("benchmarks") or res.get("endpoints") or {}
+
+
+def compare(base_path, new_path):
+    base = json.loads(Path(base_path).read_text(encoding="utf-8"))
+    new = json.loads(Path(new_path).read_text(encoding="utf-8"))
+    if base.get("kind") != new.get("kind"):
+        raise SystemExit(f"cannot compare {base.get('kind')} with {new.get('kind')}")
+    b, n = _sections(base), _sections(new)
+    for name in sorted(set(b) & set(n)):
+        for metric in METRICS:
+            old_v, new_v = b[name].get(metric), n[name].get(metric)
+            if old_v is None or new_v is None:
+                continue
+            delta = ((new_v - old_v) / old_v * 100) if old_v else 0.0
+            print(f"{name:24s} {metric:15s} {old_v:12.3f} -> {new_v:12.3f}  ({delta:+.1f}%)")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compare two benchmark result files")
+    ap.add_argument("base")
+    ap.add_argument("new")
+    args = ap.parse_args()
+    compare(args.base, args.new)
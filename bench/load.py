@@ -0,0 +1,102 @@
+# bench/load.py
+# Local load test: drives /apply and /search_candidates concurrently against a running server
+# and reports per-endpoint p50/p95/p99 latency, throughput and error counts.
+#
+#   uvicorn app:app --port 8000       (in another shell, ideally against a scratch data/ dir)
+#   python -m bench.load --url http://127.0.0.1:8000 --concurrency 8 --requests 400 --apply-ratio 0.2
+import argparse
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from bench.common import summarize, write_results
+from bench.synth import generate_candidates, generate_queries, write_resume_files
+
+MIME = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".txt": "text/plain",
+}
+
+
+def run(url, concurrency, total, apply_ratio, job_id, resume_dir, seed=1):
+    rng = random.Random(seed)
+    n_apply = int(total * apply_ratio)
+    files = write_resume_files(generate_candidates(max(n_apply, 1), seed=seed), resume_dir)
+    queries = generate_queries(max(total - n_apply, 1), seed=seed)
+
+    # fixed, shuffled plan so runs with the same seed are comparable
+    plan = [("apply", files[i % len(files)]) for i in range(n_apply)]
+    plan += [("search", queries[i % len(queries)]) for i in range(total - n_apply)]
+    rng.shuffle(plan)
+
+    samples = {"apply": [], "search": []}
+    errors = {"apply": 0, "search": 0}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=url, timeout=120)
+        return local.client
+
+    def do(item):
+        kind, arg = item
+        start = time.perf_counter()
+        try:
+            if kind == "apply":
+                path, cand = arg
+                with open(path, "rb") as f:
+                    r = client().post(f"/apply/{job_id}",
+                                      files={"file": (path.name, f, MIME.get(path.suffix, "application/octet-stream"))},
+                                      data={"name": cand["name"], "email": cand["email"],
+                                            "location": cand["location"], "experience": str(cand["experience"])})
+            else:
+                r = client().get("/search_candidates", params={"query": arg})
+            ok = r.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                samples[kind].append(elapsed)
+            else:
+                errors[kind] += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(do, plan))
+    wall = time.perf_counter() - wall_start
+
+    results = {"url": url, "concurrency": concurrency, "requests": total, "apply_ratio": apply_ratio,
+               "wall_s": round(wall, 3), "throughput_rps": round(total / wall, 2) if wall else None,
+               "endpoints": {}}
+    for kind in ("apply", "search"):
+        stats = summarize(samples[kind])
+        stats["errors"] = errors[kind]
+        stats["throughput_rps"] = round(len(samples[kind]) / wall, 2) if wall else None
+        results["endpoints"][kind] = stats
+        if stats["n"]:
+            print(f"{kind:7s} n={stats['n']:5d} err={stats['errors']:3d}  p50={stats['p50_ms']:.1f}ms  "
+                  f"p95={stats['p95_ms']:.1f}ms  p99={stats['p99_ms']:.1f}ms  {stats['throughput_rps']} req/s")
+    print(f"total   {total} requests in {wall:.2f}s  ({results['throughput_rps']} req/s)")
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="SkillMatch local load test")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--apply-ratio", type=float, default=0.2)
+    ap.add_argument("--job-id", default="job1")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default=None, help="results JSON path (default bench/results/)")
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory(prefix="skillmatch-load-") as tmp:
+        res = run(args.url, args.concurrency, args.requests, args.apply_ratio, args.job_id, tmp, seed=args.seed)
+    write_results("load", res, args.out)
@@ -0,0 +1,95 @@
+# bench/micro.py
+# Microbenchmarks for the hot helpers. Runs against a scratch SQLite DB + vector store seeded with
+# synthetic candidates, so the configured data/ directory is never touched.
+#
+#   python -m bench.micro -n 1000 --queries 50
+import argparse
+import tempfile
+from pathlib import Path
+
+from bench.common import run_timed, summarize, write_results
+from bench.synth import generate_candidates, generate_queries
+
+
+def use_scratch_store(root):
+    """Point db and vector store modules at a scratch directory (in-process only: keep sharding.shards at 1)."""
+    from config.config_loader import CONFIG
+    root = Path(root)
+    # set before the imports: chroma_store creates persist_directory and its index.json on import
+    CONFIG["database"]["path"] = str(root / "resume.db")
+    CONFIG["embeddings"]["persist_directory"] = str(root / "chroma_store")
+    import db.db as db_mod
+    import chroma.chroma_store as store
+    # already imported by the caller: repoint the module globals too
+    db_mod.DB_PATH = root / "resume.db"
+    store.PERSIST_DIR = root / "chroma_store"
+    store.PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+    store._write_lock = store._StoreLock(store.PERSIST_DIR / "write.lock")
+    if not store._pointer_path().exists():
+        store.swap_generation(0, store.MODEL_NAME)
+    return root
+
+
+def seed_store(candidates, batch_size=64):
+    """Insert candidates into SQLite and write all their vectors in one go."""
+    import json
+    from db.db import upsert_candidate
+    import chroma.chroma_store as store
+    ids = [upsert_candidate(c)[0] for c in candidates]
+    vecs = store._get_model().encode([c["raw_text"] for c in candidates], batch_size=batch_size)
+    store._save_vectors({cid: v for cid, v in zip(ids, vecs)})
+    metas = {cid: {"name": c["name"], "email": c["email"]} for cid, c in zip(ids, candidates)}
+    (store.PERSIST_DIR / "metadata.json").write_text(json.dumps(metas), encoding="utf-8")
+    return ids
+
+
+def run(n: int, n_queries: int, top_k: int):
+    from services.skill_extractor import extract_skills, normalize_skill
+    from services.query_parser import fallback_parser
+    from db.db import query_candidates
+    import chroma.chroma_store as store
+
+    candidates = generate_candidates(n)
+    queries = generate_queries(n_queries)
+    print(f"Seeding {n} synthetic candidates...")
+    seed_store(candidates)
+
+    tokens = [w for q in queries for w in q.lower().split()]
+    parsed = [fallback_parser(q) for q in queries]
+
+    def sql_filter(p):
+        where, params = [], []
+        if p.get("location"):
+            where.append("LOWER(location) = LOWER(?)")
+            params.append(p["location"])
+        if p.get("min_years") is not None:
+            where.append("CAST(experience AS INTEGER) BETWEEN ? AND ?")
+            params.extend([p["min_years"], p.get("max_years") or p["min_years"]])
+        return query_candidates(" AND ".join(where), tuple(params))
+
+    results = {"n_candidates": n, "n_queries": n_queries, "top_k": top_k, "benchmarks": {}}
+    benches = {
+        "extract_skills": (extract_skills, [(c["raw_text"],) for c in candidates]),
+        "normalize_skill": (normalize_skill, [(t,) for t in tokens]),
+        "fallback_parser": (fallback_parser, [(q,) for q in queries]),
+        "query_candidates": (sql_filter, [(p,) for p in parsed]),
+        "chroma_store.search": (lambda q: store.search(q, top_k=top_k), [(q,) for q in queries]),
+    }
+    for name, (fn, args_list) in benches.items():
+        stats = summarize(run_timed(fn, args_list))
+        results["benchmarks"][name] = stats
+        print(f"{name:24s} n={stats['n']:6d}  p50={stats['p50_ms']:.3f}ms  p95={stats['p95_ms']:.3f}ms")
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="SkillMatch microbenchmarks")
+    ap.add_argument("-n", type=int, default=500, help="synthetic candidates to seed")
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--top-k", type=int, default=50)
+    ap.add_argument("--out", default=None, help="results JSON path (default bench/results/)")
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory(prefix="skillmatch-bench-") as tmp:
+        use_scratch_store(tmp)
+        res = run(args.n, args.queries, args.top_k)
+    write_results("micro", res, args.out)
@@ -0,0 +1,151 @@
+# bench/synth.py
+# Synthetic candidate / resume generator. Skills come from config/skills_dict.json, cities and
+# experience ranges from config.yml, so generated data exercises the real parsers and filters.
+#
+#   python -m bench.synth -n 200 --out bench_data --formats pdf docx
+import argparse
+import random
+from pathlib import Path
+
+from config.config_loader import CONFIG, SKILLS_DICT
+
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Meera", "Arjun", "Kavya", "Lukas", "Sofia",
+               "Jonas", "Emma", "Noah", "Mia", "Liam", "Isabel", "Rahul", "Sneha", "Marco", "Chen"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Khan", "Reddy", "Gupta", "Müller", "Schmidt", "Rossi", "Santos",
+              "Tan", "Wong", "Fischer", "Nair", "Das", "Kumar", "Lopez", "Meyer", "Singh", "Brown"]
+TITLES = ["Developer", "Engineer", "Analyst", "Manager", "Architect"]
+QUERY_TEMPLATES = [
+    "{skill} developer with {years} years experience in {city}",
+    "{level} {skill} {skill2} engineer in {city}",
+    "{skill} and {skill2} with {years}+ years",
+    "{level} analyst {skill}",
+]
+
+
+def _skill_variant(rng, skill):
+    """Sometimes write a skill using one of its normalization_map variants (py, js, springboot...)."""
+    variants = [k for k, v in (SKILLS_DICT.get("normalization_map") or {}).items() if v == skill]
+    if variants and rng.random() < 0.3:
+        return rng.choice(variants)
+    return skill
+
+
+def generate_candidates(n: int, seed: int = 42):
+    rng = random.Random(seed)
+    skills = SKILLS_DICT.get("skills", [])
+    cities = CONFIG.get("cities", []) or ["Pune"]
+    ranges = CONFIG.get("experience_ranges", {}) or {"Mid": {"min": 3, "max": 6}}
+    out = []
+    for i in range(n):
+        level = rng.choice(list(ranges))
+        r = ranges[level]
+        years = rng.randint(r.get("min", 0), r.get("max", 0))
+        picked = rng.sample(skills, k=min(len(skills), rng.randint(3, 10)))
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        city = rng.choice(cities)
+        title = f"{level} {rng.choice(picked)} {rng.choice(TITLES)}"
+        lines = [
+            f"{first} {last}",
+            f"{title} | {city}",
+            f"Email: {first.lower()}.{last.lower()}{i}@example.com",
+            "",
+            "Summary",
+            f"{title} with {years} years of experience building production systems.",
+            "",
+            "Skills",
+            ", ".join(_skill_variant(rng, s) for s in picked),
+            "",
+            "Experience",
+        ]
+        for j in range(rng.randint(1, 4)):
+            used = rng.sample(picked, k=min(len(picked), 3))
+            lines.append(f"Project {j + 1}: delivered a platform using {', '.join(used)} for a team of "
+                         f"{rng.randint(3, 30)} engineers.")
+        out.append({
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+            "location": city,
+            "experience": years,
+            "title": title,
+            "skills": picked,
+            "raw_text": "\n".join(lines),
+        })
+    return out
+
+
+def generate_queries(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    skills = SKILLS_DICT.get("skills", [])
+    cities = CONFIG.get("cities", []) or ["Pune"]
+    levels = list(CONFIG.get("experience_ranges", {}) or ["Senior"])
+    return [rng.choice(QUERY_TEMPLATES).format(skill=rng.choice(skills), skill2=rng.choice(skills),
+                                               city=rng.choice(cities), years=rng.randint(1, 10),
+                                               level=rng.choice(levels))
+            for _ in range(n)]
+
+
+# -------------------- Resume files --------------------
+def _pdf_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, text: str):
+    """Minimal single-page PDF (Helvetica text), enough for pdfplumber to extract."""
+    ops = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+    for line in (text.splitlines() or [""])[:60]:
+        ops.append(f"({_pdf_escape(line)}) Tj T*")
+    ops.append("ET")
+    stream = "\n".join(ops).encode("latin-1", "replace")
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(objs) + 1, xref)
+    Path(path).write_bytes(bytes(out))
+
+
+def write_docx(path, text: str):
+    import docx
+    doc = docx.Document()
+    for line in text.splitlines():
+        doc.add_paragraph(line)
+    doc.save(str(path))
+
+
+def write_resume_files(candidates, out_dir, formats=("pdf", "docx")):
+    """Write one file per candidate (cycling through formats). Returns [(path, candidate)]."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    writers = {"pdf": write_pdf, "docx": write_docx, "txt": lambda p, t: Path(p).write_text(t, encoding="utf-8")}
+    files = []
+    for i, cand in enumerate(candidates):
+        fmt = formats[i % len(formats)]
+        path = out_dir / f"resume_{i:05d}.{fmt}"
+        writers[fmt](path, cand["raw_text"])
+        files.append((path, cand))
+    return files
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Generate synthetic candidates and resume files")
+    ap.add_argument("-n", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default="bench_data")
+    ap.add_argument("--formats", nargs="+", default=["pdf", "docx"], choices=["pdf", "docx", "txt"])
+    args = ap.parse_args()
+    cands = generate_candidates(args.n, seed=args.seed)
+    files = write_resume_files(cands, args.out, formats=tuple(args.formats))
+    print(f"Wrote {len(files)} resumes to {args.out}")
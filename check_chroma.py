@@ -1,6 +1,5 @@
 # check_chroma.py
-from chroma.chroma_store import _load_vectors, search, PERSIST_DIR
-import json
+from chroma.chroma_store import _load_vectors, _load_metadata, search, PERSIST_DIR
 import numpy as np
 
 # Load all vectors
@@ -8,8 +7,7 @@ vecs = _load_vectors()
 print(f"\nLoaded {len(vecs)} vectors from {PERSIST_DIR}\n")
 
 # Print stored vectors + metadata
-meta_file = PERSIST_DIR / "metadata.json"
-metas = json.loads(meta_file.read_text(encoding="utf-8")) if meta_file.exists() else {}
+metas = _load_metadata()
 
 for cid, vec in vecs.items():
     print(f"Candidate ID: {cid}")
@@ -1,57 +1,392 @@
 # chroma/chroma_store.py
 from pathlib import Path
 import json, numpy as np
-from sentence_transformers import SentenceTransformer
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows: the lock below only serializes threads of one process
+    fcntl = None
 from config.config_loader import CONFIG
+from services.metrics import timed, set_gauge
+from db.db import SHARDS, SHARD_KEY, shard_for, locate_candidate
 import os
 
 PERSIST_DIR = Path(CONFIG["embeddings"].get("persist_directory", "data/chroma_store"))
 PERSIST_DIR.mkdir(parents=True, exist_ok=True)
-VEC_FILE = PERSIST_DIR / "vectors.json"
+
+# Index generations: searches read the live generation named in index.json; a re-embedding job
+# builds the next one (gen_<n>/) beside it and swaps the pointer atomically when done.
+# Generation 0 is the original flat layout directly under PERSIST_DIR.
+POINTER_FILE = "index.json"
 
 MODEL_NAME = CONFIG["embeddings"].get("model", "all-MiniLM-L6-v2")
-MODEL = SentenceTransformer(MODEL_NAME)
-
-def _load_vectors():
-    if VEC_FILE.exists():
-        with open(VEC_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return {k: np.array(v) for k, v in data.items()}
-    return {}
-
-def _save_vectors(vecs: dict):
-    serial = {k: v.tolist() for k, v in vecs.items()}
-    with open(VEC_FILE, "w", encoding="utf-8") as f:
+_models = {}
+_model_lock = threading.Lock()
+
+class _StoreLock:
+    """
+    Re-entrant lock held across processes: a thread RLock plus an flock on PERSIST_DIR/write.lock,
+    so the server's writes and a reindex.py / reshard.py run in another process exclude each other.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fh = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._fh = open(self._path, "a")
+                fcntl.flock(self._fh, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fh:
+                    self._fh.close()
+                    self._fh = None
+                self._rlock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._fh is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+        self._rlock.release()
+
+_write_lock = _StoreLock(PERSIST_DIR / "write.lock")  # serializes read-modify-write of the live vector files (and the swap)
+
+def _pointer_path() -> Path:
+    return PERSIST_DIR / POINTER_FILE
+
+_live_cache = {"key": None, "val": None}
+
+def live_index():
+    """{"generation", "model"} of the generation searches and writes currently use."""
+    p = _pointer_path()
+    if not p.exists():
+        return {"generation": 0, "model": MODEL_NAME}
+    st = p.stat()
+    key = (str(p), st.st_mtime_ns, st.st_size)
+    if _live_cache["key"] != key:
+        _live_cache.update(key=key, val=json.loads(p.read_text(encoding="utf-8")))
+    return _live_cache["val"]
+
+def live_model_name():
+    return live_index()["model"]
+
+def swap_generation(generation: int, model: str):
+    """Atomically point searches at another generation (write temp file + os.replace)."""
+    tmp = PERSIST_DIR / (POINTER_FILE + ".tmp")
+    tmp.write_text(json.dumps({"generation": generation, "model": model}), encoding="utf-8")
+    os.replace(tmp, _pointer_path())
+
+if not _pointer_path().exists():
+    # tag what is already on disk with the model configured when it was first seen
+    swap_generation(0, MODEL_NAME)
+
+def _get_model(name: str = None):
+    # loaded on first use, so shard worker processes that only scan vectors never load it
+    name = name or live_model_name()
+    if name not in _models:
+        with _model_lock:
+            if name not in _models:
+                from sentence_transformers import SentenceTransformer
+                _models[name] = SentenceTransformer(name)
+    return _models[name]
+
+def generation_dir(generation: int) -> Path:
+    return PERSIST_DIR if generation == 0 else PERSIST_DIR / f"gen_{generation}"
+
+def shard_dir(shard: int, generation: int = None) -> Path:
+    base = generation_dir(live_index()["generation"] if generation is None else generation)
+    # one shard keeps the original flat layout
+    return base if SHARDS == 1 else base / f"shard_{shard}"
+
+def _vec_file(shard: int, generation: int = None) -> Path:
+    return shard_dir(shard, generation) / "vectors.json"
+
+def _meta_file(shard: int, generation: int = None) -> Path:
+    return shard_dir(shard, generation) / "metadata.json"
+
+def _tomb_file(shard: int, generation: int = None) -> Path:
+    return shard_dir(shard, generation) / "tombstones.json"
+
+def _shards(shard=None):
+    return range(SHARDS) if shard is None else [shard]
+
+def _load_vectors(shard: int = None, generation: int = None):
+    """{candidate_id: vector} of one shard, or of all shards when shard is None."""
+    vecs = {}
+    for s in _shards(shard):
+        f = _vec_file(s, generation)
+        if f.exists():
+            with open(f, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            vecs.update({k: np.array(v) for k, v in data.items()})
+    return vecs
+
+def _save_vectors(vecs: dict, shard: int = 0, generation: int = None):
+    shard_dir(shard, generation).mkdir(parents=True, exist_ok=True)
+    serial = {k: np.asarray(v).tolist() for k, v in vecs.items()}
+    with open(_vec_file(shard, generation), "w", encoding="utf-8") as f:
         json.dump(serial, f)
 
-def add_or_update_candidate(candidate_id: str, text: str, metadata: dict = None):
-    vecs = _load_vectors()
-    vec = MODEL.encode([text])[0]
-    vecs[candidate_id] = vec
-    _save_vectors(vecs)
-    # also optionally persist metadata file
-    meta_file = PERSIST_DIR / "metadata.json"
+def _load_metadata(shard: int = None, generation: int = None):
     metas = {}
-    if meta_file.exists():
-        metas = json.loads(meta_file.read_text(encoding="utf-8"))
-    metas[candidate_id] = metadata or {}
-    meta_file.write_text(json.dumps(metas), encoding="utf-8")
+    for s in _shards(shard):
+        f = _meta_file(s, generation)
+        if f.exists():
+            metas.update(json.loads(f.read_text(encoding="utf-8")))
+    return metas
 
-def search(query: str, top_k: int = 20):
+def _save_metadata(metas: dict, shard: int = 0, generation: int = None):
+    shard_dir(shard, generation).mkdir(parents=True, exist_ok=True)
+    _meta_file(shard, generation).write_text(json.dumps(metas), encoding="utf-8")
+
+def _load_tombstones(shard: int = None, generation: int = None):
+    """Ids deleted from the shard(s) whose vectors are still in vectors.json (until compaction)."""
+    tombs = set()
+    for s in _shards(shard):
+        f = _tomb_file(s, generation)
+        if f.exists():
+            tombs.update(json.loads(f.read_text(encoding="utf-8")))
+    return tombs
+
+def _save_tombstones(tombs, shard: int = 0, generation: int = None):
+    shard_dir(shard, generation).mkdir(parents=True, exist_ok=True)
+    tmp = _tomb_file(shard, generation).with_suffix(".tmp")
+    tmp.write_text(json.dumps(sorted(tombs)), encoding="utf-8")
+    os.replace(tmp, _tomb_file(shard, generation))
+
+def version_tag(model: str, generation: int):
+    """Stored with every vector's metadata so its producing model/generation is known."""
+    return {"embedding_model": model, "generation": generation}
+
+def encode(texts, model_name: str = None):
+    """Encode a batch of texts with the live generation's model (or model_name)."""
+    return _get_model(model_name).encode(list(texts))
+
+def get_all_vectors():
+    """{candidate_id: vector} for every stored (not deleted) candidate."""
     vecs = _load_vectors()
-    if not vecs:
-        return []
-    qv = MODEL.encode([query])[0]
-    results = []
-    for cid, vec in vecs.items():
-        # cosine similarity
-        score = float(np.dot(qv, vec) / (np.linalg.norm(qv) * np.linalg.norm(vec)))
-        results.append((cid, score))
-    results.sort(key=lambda x: x[1], reverse=True)
-    # include metadata if available
-    meta_file = PERSIST_DIR / "metadata.json"
-    metas = json.loads(meta_file.read_text(encoding="utf-8")) if meta_file.exists() else {}
+    for cid in _load_tombstones():
+        vecs.pop(cid, None)
+    return vecs
+
+def _drop_from_other_shards(candidate_id: str, keep: int):
+    for s in range(SHARDS):
+        if s == keep:
+            continue
+        ids, _ = _load_matrix(s)
+        if candidate_id in ids:
+            vecs = _load_vectors(s)
+            vecs.pop(candidate_id, None)
+            _save_vectors(vecs, s)
+            metas = _load_metadata(s)
+            metas.pop(candidate_id, None)
+            _save_metadata(metas, s)
+
+def add_or_update_candidate(candidate_id: str, text: str, metadata: dict = None, vector=None):
+    """Store the candidate's embedding. A precomputed vector skips encoding. Returns the stored vector."""
+    # same shard as the candidate's SQLite row
+    shard = locate_candidate(candidate_id)
+    if shard is None:
+        shard = shard_for(candidate_id)
+    live = live_index()
+    vec = np.asarray(vector, dtype=float) if vector is not None else encode([text], live["model"])[0]
+    with _write_lock:
+        if live_index()["model"] != live["model"]:
+            # a re-embedding swap landed meanwhile: the vector must come from the new model
+            vec = encode([text], live_index()["model"])[0]
+        live = live_index()
+        vecs = _load_vectors(shard)
+        vecs[candidate_id] = vec
+        _save_vectors(vecs, shard)
+        # also optionally persist metadata file
+        metas = _load_metadata(shard)
+        metas[candidate_id] = {**(metadata or {}), **version_tag(live["model"], live["generation"])}
+        _save_metadata(metas, shard)
+        if SHARDS > 1 and SHARD_KEY == "location":
+            # the row may have moved shards on a location change
+            _drop_from_other_shards(candidate_id, shard)
+    return vec
+
+def tombstone_candidates(candidate_ids, shard: int = 0, generation: int = None):
+    """
+    Mark candidates of one shard deleted in the vector index without rewriting vectors.json (only the
+    small tombstones.json is touched). Returns the number of ids newly tombstoned.
+    """
+    ids = set(candidate_ids or [])
+    if not ids:
+        return 0
+    with _write_lock:
+        tombs = _load_tombstones(shard, generation)
+        added = ids - tombs
+        if added:
+            _save_tombstones(tombs | added, shard, generation)
+    return len(added)
+
+def compact_shard(shard: int = 0):
+    """Rewrite a shard's vector + metadata files without its tombstoned ids. Returns the count dropped."""
+    with _write_lock:
+        tombs = _load_tombstones(shard)
+        if not tombs:
+            return 0
+        vecs, metas = _load_vectors(shard), _load_metadata(shard)
+        dropped = 0
+        for cid in tombs:
+            dropped += vecs.pop(cid, None) is not None
+            metas.pop(cid, None)
+        _save_vectors(vecs, shard)
+        _save_metadata(metas, shard)
+        _save_tombstones(set(), shard)
+    return dropped
+
+def reshard_vectors(old_shards: int, located: dict):
+    """
+    Regroup the live generation's vectors, metadata and tombstones from its old_shards layout into
+    the configured one. located: {candidate_id: new shard} (ids without a row go by shard_for).
+    Returns the number of vectors placed.
+    """
+    base = generation_dir(live_index()["generation"])
+    # the new layout's dirs are read too, so a re-run after an interruption loses nothing
+    old_dirs = [base] + [base / f"shard_{s}" for s in range(max(old_shards, SHARDS))]
+    names = ("vectors.json", "metadata.json", "tombstones.json")
+    vecs, metas, tombs = {}, {}, set()
+    for d in old_dirs:
+        parts = [d / n for n in names]
+        if parts[0].exists():
+            vecs.update(json.loads(parts[0].read_text(encoding="utf-8")))
+        if parts[1].exists():
+            metas.update(json.loads(parts[1].read_text(encoding="utf-8")))
+        if parts[2].exists():
+            tombs.update(json.loads(parts[2].read_text(encoding="utf-8")))
+
+    def new_shard(cid):
+        s = located.get(cid)
+        return shard_for(cid) if s is None else s
+
+    with _write_lock:
+        for d in old_dirs:
+            for n in names:
+                (d / n).unlink(missing_ok=True)
+            if d != base and d.exists() and not any(d.iterdir()):
+                d.rmdir()
+        for s in range(SHARDS):
+            _save_vectors({k: v for k, v in vecs.items() if new_shard(k) == s}, s)
+            _save_metadata({k: v for k, v in metas.items() if new_shard(k) == s}, s)
+            _save_tombstones({k for k in tombs if new_shard(k) == s}, s)
+    _matrix_cache.clear()
+    _mask_cache.clear()
+    return len(vecs)
+
+_matrix_cache = {}  # shard -> {"key", "ids", "mat"}
+_shard_sizes = {}
+
+_mask_cache = {}  # shard -> {"key", "mask"}
+_shard_tombs = {}
+
+def shard_counts(shard: int):
+    """(vectors, tombstoned vectors) last loaded for a shard in this process, for reporting elsewhere."""
+    return _shard_sizes.get(shard), _shard_tombs.get(shard)
+
+def record_shard_counts(shard: int, counts):
+    """Publish shard_counts() taken in a worker process through this process's gauges."""
+    size, tombs = counts
+    if size is not None:
+        _shard_sizes[shard] = size
+        set_gauge("vector_index_size", sum(_shard_sizes.values()))
+    if tombs is not None:
+        _shard_tombs[shard] = tombs
+        set_gauge("vector_tombstones", sum(_shard_tombs.values()))
+
+def _deleted_mask(shard: int, ids):
+    """Boolean mask over the shard matrix rows that are tombstoned (None when there are none)."""
+    f = _tomb_file(shard)
+    if not f.exists():
+        return None
+    st = f.stat()
+    # rebuilt when either the tombstones or the matrix (its row order) change
+    key = (str(f), st.st_mtime_ns, st.st_size, (_matrix_cache.get(shard) or {}).get("key"))
+    cached = _mask_cache.get(shard)
+    if not cached or cached["key"] != key:
+        tombs = _load_tombstones(shard)
+        mask = np.fromiter((i in tombs for i in ids), dtype=bool, count=len(ids)) if tombs else None
+        cached = _mask_cache[shard] = {"key": key, "mask": mask if mask is not None and mask.any() else None}
+        _shard_tombs[shard] = int(mask.sum()) if mask is not None else 0
+        set_gauge("vector_tombstones", sum(_shard_tombs.values()))
+    return cached["mask"]
+
+def _load_matrix(shard: int = 0):
+    """(ids, row-normalized float32 matrix) of a shard's vectors, cached until its vectors.json changes."""
+    f = _vec_file(shard)
+    if not f.exists():
+        return [], None
+    st = f.stat()
+    key = (str(f), st.st_mtime_ns, st.st_size)
+    cached = _matrix_cache.get(shard)
+    if not cached or cached["key"] != key:
+        vecs = _load_vectors(shard)
+        ids = list(vecs)
+        mat = None
+        if ids:
+            mat = np.vstack([vecs[i] for i in ids]).astype(np.float32)
+            norms = np.linalg.norm(mat, axis=1, keepdims=True)
+            mat /= np.where(norms == 0, 1.0, norms)
+        cached = _matrix_cache[shard] = {"key": key, "ids": ids, "mat": mat}
+        _shard_sizes[shard] = len(ids)
+        set_gauge("vector_index_size", sum(_shard_sizes.values()))
+    return cached["ids"], cached["mat"]
+
+def encode_queries(queries):
+    """Row-normalized float32 query matrix."""
+    with timed("query_encode"):
+        qm = np.asarray(encode(queries), dtype=np.float32)
+        qn = np.linalg.norm(qm, axis=1, keepdims=True)
+        qm /= np.where(qn == 0, 1.0, qn)
+    return qm
+
+def search_vectors(qm, top_k: int = 20, shard: int = None):
+    """Cosine top_k per row of an encoded query matrix: one matrix-matrix product per shard."""
+    per_query = [[] for _ in range(len(qm))]
+    metas = {}
+    with timed("vector_scan"):
+        for s in _shards(shard):
+            ids, mat = _load_matrix(s)
+            if mat is None:
+                continue
+            scores = qm @ mat.T
+            deleted = _deleted_mask(s, ids)
+            live = len(ids)
+            if deleted is not None:
+                # tombstoned rows can never reach the top k
+                scores[:, deleted] = -np.inf
+                live -= int(deleted.sum())
+            k = min(top_k, live)
+            if k <= 0:
+                continue
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for qi in range(len(qm)):
+                per_query[qi].extend((ids[j], float(scores[qi, j])) for j in top[qi])
+            # include metadata if available
+            metas.update(_load_metadata(s))
     out = []
-    for cid, score in results[:top_k]:
-        out.append({"id": cid, "score": float(score), "metadata": metas.get(cid, {})})
+    for hits in per_query:
+        hits.sort(key=lambda x: x[1], reverse=True)
+        out.append([{"id": cid, "score": score, "metadata": metas.get(cid, {})} for cid, score in hits[:top_k]])
     return out
+
+def search_many(queries, top_k: int = 20, shard: int = None):
+    """Cosine top_k for several queries at once: one batched encode and one matrix-matrix product."""
+    queries = list(queries)
+    if not queries:
+        return []
+    return search_vectors(encode_queries(queries), top_k, shard)
+
+def search(query: str, top_k: int = 20):
+    return search_many([query], top_k)[0]
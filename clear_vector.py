@@ -1,11 +1,18 @@
 # scripts/clear_vectors.py
+import shutil
 from pathlib import Path
 from config.config_loader import CONFIG
 p = Path(CONFIG["embeddings"].get("persist_directory", "data/chroma_store"))
-vec = p / "vectors.json"
-meta = p / "metadata.json"
-for f in (vec, meta):
+# flat layout plus shard_<i>/ sub-directories when sharding is enabled
+for f in list(p.glob("vectors.json")) + list(p.glob("metadata.json")) + \
+         list(p.glob("shard_*/vectors.json")) + list(p.glob("shard_*/metadata.json")) + \
+         list(p.glob("tombstones.json")) + list(p.glob("shard_*/tombstones.json")) + \
+         list(p.glob("index.json")) + list(p.glob("reindex_checkpoint.json")):
     if f.exists():
         f.unlink()
         print("Removed", f)
+# index generations built by re-embedding runs
+for d in p.glob("gen_*"):
+    shutil.rmtree(d, ignore_errors=True)
+    print("Removed", d)
 print("Cleared vector store.")
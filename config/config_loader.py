@@ -1,4 +1,5 @@
 from pathlib import Path
+import copy
 import yaml, json
 
 # Base config directory
@@ -19,3 +20,63 @@ if not skills_path.exists():
 
 with open(skills_path, "r") as f:
     SKILLS_DICT = json.load(f)
+
+
+# Read once at import (file paths, storage layout, signature / histogram parameters): edits to these
+# only take effect after a restart. Everything else is read through section() at use time.
+RESTART_KEYS = [
+    ("database",), ("sharding",), ("metrics",), ("reload",),
+    ("embeddings", "model"), ("embeddings", "persist_directory"),
+    ("uploads", "directory"),
+    ("dedupe", "shingle_size"), ("dedupe", "num_perm"), ("dedupe", "bands"),
+]
+
+_startup = copy.deepcopy(CONFIG)
+
+
+def section(name: str) -> dict:
+    """A top-level config section, looked up per call so /admin/reload changes apply."""
+    return CONFIG.get(name, {}) or {}
+
+
+def _lookup(config: dict, path):
+    for key in path:
+        if not isinstance(config, dict):
+            return None
+        config = config.get(key)
+    return config
+
+
+def restart_required():
+    """Dotted keys from RESTART_KEYS whose value was changed by a reload since the process started."""
+    return [".".join(path) for path in RESTART_KEYS if _lookup(CONFIG, path) != _lookup(_startup, path)]
+
+
+def source_key():
+    """Modification stamp of config.yml + skills_dict.json; changes whenever either file is edited."""
+    stats = [p.stat() for p in (config_path, skills_path)]
+    return tuple((st.st_mtime_ns, st.st_size) for st in stats)
+
+
+def _replace_contents(target: dict, new: dict):
+    # keys are swapped one at a time (no moment where the dict is empty); stale keys dropped last
+    target.update(new)
+    for k in [k for k in target if k not in new]:
+        target.pop(k, None)
+
+
+def reload():
+    """
+    Re-read config.yml and skills_dict.json into CONFIG / SKILLS_DICT (same objects, updated in place).
+    Both files are parsed before anything is changed, so a broken file raises and leaves the old values.
+    Settings copied into module globals at import (RESTART_KEYS) still need a restart; see restart_required().
+    """
+    with open(config_path, "r") as f:
+        new_config = yaml.safe_load(f)
+    with open(skills_path, "r") as f:
+        new_skills = json.load(f)
+    if not isinstance(new_config, dict) or not isinstance(new_skills, dict):
+        raise ValueError("config.yml and skills_dict.json must each contain a mapping")
+    _replace_contents(CONFIG, new_config)
+    _replace_contents(SKILLS_DICT, new_skills)
+    return CONFIG, SKILLS_DICT
@@ -1,29 +1,94 @@
 import sqlite3
 import json
+import re
 import hashlib
 import uuid
+import zlib
 from pathlib import Path
 from datetime import datetime
 from config.config_loader import CONFIG
 
 DB_PATH = Path(CONFIG["database"]["path"])
 TABLE = CONFIG["database"].get("table_name", "candidates")
+CACHE_TABLE = "extraction_cache"
+MATCH_TABLE = "job_matches"
+MATCH_STATE_TABLE = "job_match_state"
+MINHASH_TABLE = "minhash_signatures"
+LSH_TABLE = "lsh_buckets"
+DUP_TABLE = "duplicates"
+FTS_TABLE = f"{TABLE}_fts"
 
+# Candidate rows (+ their FTS entries) are partitioned into SHARDS SQLite files by candidate id hash
+# or by location. The main DB (DB_PATH) keeps the shared tables (extraction cache, job matches,
+# near-duplicate index); with a single shard it is also the only candidate shard, i.e. the original
+# layout. The layout the rows were written with is recorded in the main DB; when config.yml asks for
+# another one, init_db refuses to run until reshard.py has moved the rows and vectors.
+SHARD_CFG = CONFIG.get("sharding", {}) or {}
+SHARDS = max(1, int(SHARD_CFG.get("shards", 1)))
+SHARD_KEY = SHARD_CFG.get("key", "id")
+LAYOUT_TABLE = "layout"
 
-def get_conn():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+_ready = set()  # db paths whose schema (and FTS backfill) is done in this process
+
+
+def shard_path(shard: int = None, shards: int = None) -> Path:
+    """File of a candidate shard (None: the main DB); `shards` overrides the configured shard count."""
+    shards = SHARDS if shards is None else shards
+    if shard is None or shards == 1:
+        return DB_PATH
+    return DB_PATH.with_name(f"{DB_PATH.stem}_shard{shard}{DB_PATH.suffix}")
+
+
+def shard_for(candidate_id: str, location: str = None) -> int:
+    """Stable shard index for a candidate (crc32, so every process agrees)."""
+    if SHARDS == 1:
+        return 0
+    key = (location or "").strip().lower() if SHARD_KEY == "location" else str(candidate_id)
+    return zlib.crc32(key.encode("utf-8")) % SHARDS
+
+
+def _connect(path: Path):
+    conn = sqlite3.connect(str(path), timeout=30)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def get_conn(shard: int = None):
+    path = shard_path(shard)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return _connect(path)
+
+
 def compute_text_hash(text: str) -> str:
     return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
 
 
 def init_db():
-    conn = get_conn()
+    if DB_PATH not in _ready or not DB_PATH.exists():
+        _init_schema(None)
+        _check_layout()
+        _ready.add(DB_PATH)
+    for shard in range(SHARDS):
+        path = shard_path(shard)
+        if path in _ready and path.exists():
+            continue
+        _init_schema(shard)
+        _ready.add(path)
+
+
+def _init_schema(shard: int = None):
+    """Main DB (shard None): shared tables, plus the candidate tables when unsharded. Shard files: candidate tables."""
+    conn = get_conn(shard)
     cur = conn.cursor()
+    if shard is None:
+        _create_shared_tables(cur)
+    if shard is not None or SHARDS == 1:
+        _create_candidate_tables(cur)
+    conn.commit()
+    conn.close()
+
+
+def _create_candidate_tables(cur):
     cur.execute(f"""
         CREATE TABLE IF NOT EXISTS {TABLE} (
             id TEXT PRIMARY KEY,
@@ -37,34 +102,276 @@ def init_db():
             skills_json TEXT,
             raw_text TEXT,
             text_hash TEXT,
+            file_hash TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_at TIMESTAMP,
             UNIQUE(email),
             UNIQUE(text_hash)
         );
     """)
+    # tombstones: tables created before deletes existed lack the column
+    columns = {r["name"] for r in cur.execute(f"PRAGMA table_info({TABLE})")}
+    if "deleted_at" not in columns:
+        cur.execute(f"ALTER TABLE {TABLE} ADD COLUMN deleted_at TIMESTAMP")
+    # the upload's extraction cache entry, dropped when the candidate is deleted
+    if "file_hash" not in columns:
+        cur.execute(f"ALTER TABLE {TABLE} ADD COLUMN file_hash TEXT")
+    # lexical index over resume text (BM25), kept in sync by upsert_candidate
+    cur.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            candidate_id UNINDEXED,
+            raw_text,
+            tokenize = 'unicode61'
+        );
+    """)
+    # index rows written before the FTS table existed
+    cur.execute(f"""
+        INSERT INTO {FTS_TABLE} (candidate_id, raw_text)
+        SELECT id, COALESCE(raw_text, '') FROM {TABLE}
+        WHERE deleted_at IS NULL AND id NOT IN (SELECT candidate_id FROM {FTS_TABLE})
+    """)
+
+
+def _create_shared_tables(cur):
+    # content-addressed cache: sha256 of the uploaded file -> extracted text, skills, embedding;
+    # skills_key is the skills dictionary they were extracted with
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CACHE_TABLE} (
+            file_hash TEXT PRIMARY KEY,
+            raw_text TEXT,
+            skills_json TEXT,
+            skills_key TEXT,
+            embedding_json TEXT,
+            embedding_model TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    if "skills_key" not in {r["name"] for r in cur.execute(f"PRAGMA table_info({CACHE_TABLE})")}:
+        cur.execute(f"ALTER TABLE {CACHE_TABLE} ADD COLUMN skills_key TEXT")
+    # materialized top-N candidates per job
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MATCH_TABLE} (
+            job_id TEXT NOT NULL,
+            candidate_id TEXT NOT NULL,
+            score REAL NOT NULL,
+            semantic REAL,
+            skill_score REAL,
+            location_score REAL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (job_id, candidate_id)
+        );
+    """)
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{MATCH_TABLE}_rank ON {MATCH_TABLE} (job_id, score DESC);")
+    # cutoff: best score of any candidate left out of the job's stored list (NULL: nobody left out)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MATCH_STATE_TABLE} (
+            job_id TEXT PRIMARY KEY,
+            cutoff REAL
+        );
+    """)
+    # near-duplicate detection: MinHash signature per candidate + LSH band buckets
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MINHASH_TABLE} (
+            candidate_id TEXT PRIMARY KEY,
+            signature BLOB NOT NULL
+        );
+    """)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LSH_TABLE} (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            candidate_id TEXT NOT NULL,
+            PRIMARY KEY (band, bucket, candidate_id)
+        ) WITHOUT ROWID;
+    """)
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{LSH_TABLE}_cand ON {LSH_TABLE} (candidate_id);")
+    # candidate -> the earlier candidate it near-duplicates; policy "link" or "flag"
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DUP_TABLE} (
+            candidate_id TEXT PRIMARY KEY,
+            duplicate_of TEXT NOT NULL,
+            similarity REAL,
+            policy TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    # (shards, key) the candidate rows are stored in; see stored_layout()
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LAYOUT_TABLE} (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """)
+
+
+# -------------------- Shard layout --------------------
+def _layout(shards: int, key: str):
+    # the key only matters when there is more than one shard
+    return (shards, key if shards > 1 else None)
+
+
+def current_layout():
+    return _layout(SHARDS, SHARD_KEY)
+
+
+def _has_rows(path: Path):
+    if not path.exists():
+        return False
+    conn = _connect(path)
+    try:
+        return conn.execute(f"SELECT 1 FROM {TABLE} LIMIT 1").fetchone() is not None
+    except sqlite3.OperationalError:  # no candidates table in this file
+        return False
+    finally:
+        conn.close()
+
+
+def _detect_layout():
+    """Layout of a database from before the layout was recorded."""
+    if _has_rows(DB_PATH):
+        return _layout(1, None)
+    shard_files = list(DB_PATH.parent.glob(f"{DB_PATH.stem}_shard*{DB_PATH.suffix}"))
+    if any(_has_rows(f) for f in shard_files):
+        return _layout(len(shard_files), SHARD_KEY)
+    return current_layout()
+
+
+def save_layout(layout):
+    conn = get_conn()
+    conn.executemany(f"INSERT OR REPLACE INTO {LAYOUT_TABLE} (key, value) VALUES (?, ?)",
+                     [("shards", str(layout[0])), ("key", layout[1] or "")])
     conn.commit()
     conn.close()
 
 
-def upsert_candidate(candidate: dict):
-    init_db()
+def stored_layout():
+    """(shards, key) the candidate rows are stored in; detected and recorded on first use."""
+    _init_schema(None)
     conn = get_conn()
-    cur = conn.cursor()
+    rows = {r["key"]: r["value"] for r in conn.execute(f"SELECT key, value FROM {LAYOUT_TABLE}")}
+    conn.close()
+    if "shards" in rows:
+        return _layout(int(rows["shards"]), rows.get("key") or None)
+    layout = _detect_layout()
+    save_layout(layout)
+    return layout
 
-    cid = candidate.get("id") or str(uuid.uuid4())
-    skills_json = json.dumps(candidate.get("skills", []), ensure_ascii=False)
-    text_hash = compute_text_hash(candidate.get("raw_text", "") or "")
 
-    existing = None
-    if candidate.get("email"):
-        cur.execute(f"SELECT id FROM {TABLE} WHERE email = ? LIMIT 1", (candidate.get("email"),))
-        existing = cur.fetchone()
-    if not existing:
-        cur.execute(f"SELECT id FROM {TABLE} WHERE text_hash = ? LIMIT 1", (text_hash,))
-        existing = cur.fetchone()
+def _check_layout():
+    stored = stored_layout()
+    if stored != current_layout():
+        raise RuntimeError(
+            f"candidate rows are stored in {stored[0]} shard(s) (key {stored[1]}) but config.yml asks for "
+            f"{SHARDS} (key {SHARD_KEY}); stop the server and run `python reshard.py` to move them")
+
+
+def reshard_rows(old_layout):
+    """
+    Move every candidate row (tombstoned ones too) from the old_layout shard files into the
+    configured ones and re-index their FTS entries. Files the new layout no longer uses are emptied
+    (the main DB) or deleted (old shard files). Returns {candidate_id: new shard}.
+    """
+    old_paths = [shard_path(s, old_layout[0]) for s in range(old_layout[0])]
+    new_paths = [shard_path(s) for s in range(SHARDS)]
+    for shard in range(SHARDS):
+        _init_schema(shard)
+
+    moves = {}  # source path -> {dest path: [row dicts]}
+    for src in old_paths:
+        if not _has_rows(src):
+            continue
+        conn = _connect(src)
+        _create_candidate_tables(conn.cursor())  # old files may predate deleted_at / FTS
+        conn.commit()
+        for r in conn.execute(f"SELECT * FROM {TABLE}").fetchall():
+            row = dict(r)
+            dest = new_paths[shard_for(row["id"], row.get("location"))]
+            if dest != src:
+                moves.setdefault(src, {}).setdefault(dest, []).append(row)
+        conn.close()
+
+    # copy first, then delete from the source: an interrupted run leaves duplicates, never losses
+    for by_dest in moves.values():
+        for dest, rows in by_dest.items():
+            conn = _connect(dest)
+            cur = conn.cursor()
+            for row in rows:
+                cols = list(row)
+                cur.execute(f"INSERT OR REPLACE INTO {TABLE} ({', '.join(cols)}) "
+                            f"VALUES ({', '.join('?' * len(cols))})", [row[c] for c in cols])
+                cur.execute(f"DELETE FROM {FTS_TABLE} WHERE candidate_id = ?", (row["id"],))
+                if row.get("deleted_at") is None:
+                    cur.execute(f"INSERT INTO {FTS_TABLE} (candidate_id, raw_text) VALUES (?, ?)",
+                                (row["id"], row.get("raw_text") or ""))
+            conn.commit()
+            conn.close()
+    for src, by_dest in moves.items():
+        conn = _connect(src)
+        for rows in by_dest.values():
+            ids = [r["id"] for r in rows]
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                conn.execute(f"DELETE FROM {TABLE} WHERE id IN ({marks})", chunk)
+                conn.execute(f"DELETE FROM {FTS_TABLE} WHERE candidate_id IN ({marks})", chunk)
+        conn.commit()
+        conn.close()
+
+    for src in old_paths:
+        if src in new_paths or not src.exists():
+            continue
+        if src == DB_PATH:
+            # sharded now: the main DB keeps only the shared tables
+            conn = _connect(src)
+            conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+            conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            conn.commit()
+            conn.close()
+        else:
+            src.unlink()
+
+    located = {}
+    for shard, path in enumerate(new_paths):
+        conn = _connect(path)
+        located.update((r["id"], shard) for r in conn.execute(f"SELECT id FROM {TABLE}"))
+        conn.close()
+    _ready.clear()
+    return located
+
+
+def _sync_fts(cur, candidate_id: str):
+    cur.execute(f"DELETE FROM {FTS_TABLE} WHERE candidate_id = ?", (candidate_id,))
+    cur.execute(f"""
+        INSERT INTO {FTS_TABLE} (candidate_id, raw_text)
+        SELECT id, COALESCE(raw_text, '') FROM {TABLE} WHERE id = ?
+    """, (candidate_id,))
+
 
-    values = {
+def _find_existing(email: str, text_hash: str):
+    """(shard, id) of the row an upsert would update: same email first, then same text hash."""
+    for col, val in (("email", email), ("text_hash", text_hash)):
+        if not val:
+            continue
+        for shard in range(SHARDS):
+            conn = get_conn(shard)
+            row = conn.execute(f"SELECT id FROM {TABLE} WHERE {col} = ? LIMIT 1", (val,)).fetchone()
+            conn.close()
+            if row:
+                return shard, row["id"]
+    return None, None
+
+
+def _delete_from_shard(shard: int, candidate_id: str):
+    conn = get_conn(shard)
+    conn.execute(f"DELETE FROM {TABLE} WHERE id = ?", (candidate_id,))
+    conn.execute(f"DELETE FROM {FTS_TABLE} WHERE candidate_id = ?", (candidate_id,))
+    conn.commit()
+    conn.close()
+
+
+def _candidate_values(cid: str, candidate: dict, text_hash: str):
+    return {
         "id": cid,
         "filename": candidate.get("filename"),
         "name": candidate.get("name"),
@@ -73,19 +380,45 @@ def upsert_candidate(candidate: dict):
         "title": candidate.get("title"),
         "location": candidate.get("location"),
         "experience": candidate.get("experience"),
-        "skills_json": skills_json,
+        "skills_json": json.dumps(candidate.get("skills", []), ensure_ascii=False),
         "raw_text": candidate.get("raw_text"),
         "text_hash": text_hash,
+        "file_hash": candidate.get("file_hash"),
         "updated_at": datetime.utcnow().isoformat()
     }
 
+
+def find_existing_candidate(email: str, raw_text: str):
+    """Id of the row upsert_candidate would update for this email / resume text (exact match), or None."""
+    init_db()
+    return _find_existing(email, compute_text_hash(raw_text or ""))[1]
+
+
+def upsert_candidate(candidate: dict):
+    init_db()
+
+    cid = candidate.get("id") or str(uuid.uuid4())
+    text_hash = compute_text_hash(candidate.get("raw_text", "") or "")
+
+    existing_shard, existing = _find_existing(candidate.get("email"), text_hash)
+    shard = shard_for(existing or cid, candidate.get("location"))
+    if existing and existing_shard != shard:
+        # location-keyed sharding and the location changed: move the row, keeping its id
+        _delete_from_shard(existing_shard, existing)
+        cid = existing
+
+    conn = get_conn(shard)
+    cur = conn.cursor()
+
+    values = _candidate_values(cid, candidate, text_hash)
+
     try:
         if values["email"]:
             cur.execute(f"""
                 INSERT INTO {TABLE} (id, filename, name, email, phone, title, location, experience,
-                                    skills_json, raw_text, text_hash, created_at, updated_at)
+                                    skills_json, raw_text, text_hash, file_hash, created_at, updated_at)
                 VALUES (:id, :filename, :name, :email, :phone, :title, :location, :experience,
-                        :skills_json, :raw_text, :text_hash, CURRENT_TIMESTAMP, :updated_at)
+                        :skills_json, :raw_text, :text_hash, :file_hash, CURRENT_TIMESTAMP, :updated_at)
                 ON CONFLICT(email) DO UPDATE SET
                     filename=excluded.filename,
                     name=excluded.name,
@@ -96,14 +429,15 @@ def upsert_candidate(candidate: dict):
                     skills_json=excluded.skills_json,
                     raw_text=excluded.raw_text,
                     text_hash=excluded.text_hash,
+                    file_hash=excluded.file_hash,
                     updated_at=excluded.updated_at;
             """, values)
         else:
             cur.execute(f"""
                 INSERT INTO {TABLE} (id, filename, name, phone, title, location, experience,
-                                    skills_json, raw_text, text_hash, created_at, updated_at)
+                                    skills_json, raw_text, text_hash, file_hash, created_at, updated_at)
                 VALUES (:id, :filename, :name, :phone, :title, :location, :experience,
-                        :skills_json, :raw_text, :text_hash, CURRENT_TIMESTAMP, :updated_at)
+                        :skills_json, :raw_text, :text_hash, :file_hash, CURRENT_TIMESTAMP, :updated_at)
                 ON CONFLICT(text_hash) DO UPDATE SET
                     filename=excluded.filename,
                     name=excluded.name,
@@ -113,6 +447,7 @@ def upsert_candidate(candidate: dict):
                     experience=excluded.experience,
                     skills_json=excluded.skills_json,
                     raw_text=excluded.raw_text,
+                    file_hash=excluded.file_hash,
                     updated_at=excluded.updated_at;
             """, values)
         conn.commit()
@@ -122,12 +457,54 @@ def upsert_candidate(candidate: dict):
     cur.execute(f"SELECT id FROM {TABLE} WHERE email = ? OR text_hash = ? LIMIT 1",
                 (values["email"], text_hash))
     row = cur.fetchone()
+    found_id = row["id"] if row else cid
+    _sync_fts(cur, found_id)
+    conn.commit()
     conn.close()
 
-    found_id = row["id"] if row else cid
     return found_id, not bool(existing)
 
 
+def merge_candidate(target_id: str, candidate: dict):
+    """
+    Overwrite an existing candidate with a new upload (near-duplicate resume), keeping its id.
+    Returns the id of the row written: target_id, or another row's if the merge fell back to an upsert.
+    """
+    init_db()
+    shard = locate_candidate(target_id)
+    if shard is None:
+        return upsert_candidate(candidate)[0]
+    if shard != shard_for(target_id, candidate.get("location")):
+        # location-keyed sharding and the location changed: re-insert under the same id
+        _delete_from_shard(shard, target_id)
+        return upsert_candidate({**candidate, "id": target_id})[0]
+
+    values = _candidate_values(target_id, candidate, compute_text_hash(candidate.get("raw_text", "") or ""))
+    conn = get_conn(shard)
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            UPDATE {TABLE} SET filename=:filename, name=:name, email=:email, phone=:phone, title=:title,
+                location=:location, experience=:experience, skills_json=:skills_json, raw_text=:raw_text,
+                text_hash=:text_hash, file_hash=:file_hash, updated_at=:updated_at
+            WHERE id = :id AND deleted_at IS NULL
+        """, values)
+        merged = cur.rowcount > 0
+        if merged:
+            _sync_fts(cur, target_id)
+        conn.commit()
+    except sqlite3.IntegrityError:
+        # the email / resume text already belongs to another row
+        conn.rollback()
+        merged = False
+    conn.close()
+    if not merged:
+        # target tombstoned meanwhile, or the upload collides with another row: a normal upsert, so
+        # the caller gets the id whose row was actually written
+        return upsert_candidate(candidate)[0]
+    return target_id
+
+
 def _parse_skills_field(d):
     if "skills_json" in d and d["skills_json"]:
         try:
@@ -139,25 +516,468 @@ def _parse_skills_field(d):
     return d
 
 
+def _candidate_shards(candidate_id: str):
+    # id-hashed shards can be computed; location-keyed ones have to be probed
+    return [shard_for(candidate_id)] if SHARD_KEY == "id" else list(range(SHARDS))
+
+
+def locate_candidate(candidate_id: str):
+    """Shard index holding the candidate row, or None."""
+    init_db()
+    for shard in _candidate_shards(candidate_id):
+        conn = get_conn(shard)
+        row = conn.execute(f"SELECT 1 FROM {TABLE} WHERE id = ?", (candidate_id,)).fetchone()
+        conn.close()
+        if row:
+            return shard
+    return None
+
+
 def get_candidate_by_id(candidate_id: str):
     init_db()
+    for shard in _candidate_shards(candidate_id):
+        conn = get_conn(shard)
+        cur = conn.cursor()
+        cur.execute(f"SELECT * FROM {TABLE} WHERE id = ? AND deleted_at IS NULL", (candidate_id,))
+        row = cur.fetchone()
+        conn.close()
+        if row:
+            return _parse_skills_field(dict(row))
+    return None
+
+
+def get_candidates_by_ids(ids):
+    """{id: candidate} for the given ids, across shards."""
+    ids = list(dict.fromkeys(ids or []))
+    if not ids:
+        return {}
+    init_db()
+    by_shard = {}
+    for cid in ids:
+        for shard in _candidate_shards(cid):
+            by_shard.setdefault(shard, []).append(cid)
+    out = {}
+    for shard, shard_ids in by_shard.items():
+        conn = get_conn(shard)
+        for i in range(0, len(shard_ids), 500):
+            chunk = shard_ids[i:i + 500]
+            cur = conn.execute(f"SELECT * FROM {TABLE} WHERE deleted_at IS NULL "
+                               f"AND id IN ({','.join('?' * len(chunk))})", chunk)
+            for row in cur.fetchall():
+                out[row["id"]] = _parse_skills_field(dict(row))
+        conn.close()
+    return out
+
+
+def query_candidates(where: str = "", params: tuple = (), shard: int = None, include_deleted: bool = False,
+                     ids=None):
+    """
+    Rows matching where; from every shard, or only from `shard`. Tombstoned rows are skipped.
+    With ids, only those candidates are considered (an id IN (...) clause, so SQLite does the cut).
+    """
+    init_db()
+    out = []
+    if not include_deleted:
+        where = f"deleted_at IS NULL AND ({where})" if where else "deleted_at IS NULL"
+    if ids is not None:
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return []
+    id_chunks = [None] if ids is None else [ids[i:i + 500] for i in range(0, len(ids), 500)]
+    for s in (range(SHARDS) if shard is None else [shard]):
+        conn = get_conn(s)
+        cur = conn.cursor()
+        for chunk in id_chunks:
+            clauses, args = [where] if where else [], list(params or ())
+            if chunk is not None:
+                clauses.append(f"id IN ({','.join('?' * len(chunk))})")
+                args.extend(chunk)
+            sql = f"SELECT * FROM {TABLE}"
+            if clauses:
+                sql += " WHERE " + " AND ".join(f"({c})" for c in clauses)
+            cur.execute(sql, args)
+            rows = cur.fetchall()
+            cols = [c[0] for c in cur.description] if cur.description else []
+            out.extend(_parse_skills_field(dict(zip(cols, r))) for r in rows)
+        conn.close()
+    return out
+
+
+def live_candidate_ids(shard: int):
+    """Ids of a shard's live (not tombstoned) candidates."""
+    init_db()
+    conn = get_conn(shard)
+    ids = {r["id"] for r in conn.execute(f"SELECT id FROM {TABLE} WHERE deleted_at IS NULL")}
+    conn.close()
+    return ids
+
+
+def iter_candidate_chunks(shard: int, after_id: str = None, size: int = 256):
+    """Stream a shard's candidates in id order, `size` rows at a time (keyset pagination, resumable)."""
+    init_db()
+    last = after_id or ""
+    while True:
+        conn = get_conn(shard)
+        rows = conn.execute(f"""
+            SELECT id, name, email, raw_text, updated_at FROM {TABLE}
+            WHERE id > ? AND deleted_at IS NULL ORDER BY id LIMIT ?
+        """, (last, size)).fetchall()
+        conn.close()
+        if not rows:
+            return
+        yield [dict(r) for r in rows]
+        last = rows[-1]["id"]
+
+
+def fts_search(query: str, limit: int = 200, shard: int = None):
+    """
+    BM25 keyword search over resume text. Returns [(candidate_id, score)] best first,
+    score = -bm25 (higher is better). Query terms are OR-ed; BM25 rewards rare/exact terms.
+    Across shards the per-shard BM25 scores are merged as-is (IDF is per shard).
+    """
+    terms = [t for t in re.findall(r"\w+", (query or "").lower()) if len(t) > 1]
+    if not terms:
+        return []
+    match = " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+    init_db()
+    out = []
+    for s in (range(SHARDS) if shard is None else [shard]):
+        conn = get_conn(s)
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT candidate_id, -bm25({FTS_TABLE}) AS score FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH ? ORDER BY bm25({FTS_TABLE}) LIMIT ?
+        """, (match, limit))
+        out.extend((r["candidate_id"], float(r["score"])) for r in cur.fetchall())
+        conn.close()
+    out.sort(key=lambda x: x[1], reverse=True)
+    return out[:limit]
+
+
+# -------------------- Extraction cache --------------------
+def get_cached_extraction(file_hash: str):
+    """Return {"raw_text", "skills", "skills_key"} for a previously extracted file, or None."""
+    if not file_hash:
+        return None
+    init_db()
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(f"SELECT raw_text, skills_json, skills_key FROM {CACHE_TABLE} WHERE file_hash = ?", (file_hash,))
+    row = cur.fetchone()
+    conn.close()
+    if not row:
+        return None
+    return {"raw_text": row["raw_text"] or "", "skills": json.loads(row["skills_json"] or "[]"),
+            "skills_key": row["skills_key"]}
+
+
+def cache_extraction(file_hash: str, raw_text: str, skills: list, skills_key: str):
+    init_db()
+    conn = get_conn()
+    conn.execute(f"""
+        INSERT INTO {CACHE_TABLE} (file_hash, raw_text, skills_json, skills_key) VALUES (?, ?, ?, ?)
+        ON CONFLICT(file_hash) DO UPDATE SET raw_text=excluded.raw_text, skills_json=excluded.skills_json,
+            skills_key=excluded.skills_key;
+    """, (file_hash, raw_text, json.dumps(skills or [], ensure_ascii=False), skills_key))
+    conn.commit()
+    conn.close()
+
+
+def get_cached_embedding(file_hash: str, model_name: str):
+    """Return the cached embedding (list of floats) for a file, only if it was produced by model_name."""
+    if not file_hash:
+        return None
+    init_db()
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute(f"SELECT * FROM {TABLE} WHERE id = ?", (candidate_id,))
+    cur.execute(f"SELECT embedding_json, embedding_model FROM {CACHE_TABLE} WHERE file_hash = ?", (file_hash,))
     row = cur.fetchone()
     conn.close()
-    return _parse_skills_field(dict(row)) if row else None
+    if not row or not row["embedding_json"] or row["embedding_model"] != model_name:
+        return None
+    return json.loads(row["embedding_json"])
+
+
+def cache_embedding(file_hash: str, embedding, model_name: str):
+    if not file_hash:
+        return
+    init_db()
+    conn = get_conn()
+    conn.execute(f"UPDATE {CACHE_TABLE} SET embedding_json = ?, embedding_model = ? WHERE file_hash = ?",
+                 (json.dumps([float(x) for x in embedding]), model_name, file_hash))
+    conn.commit()
+    conn.close()
+
+
+# -------------------- Job matches --------------------
+def _match_values(job_id, candidate_id, m):
+    return (job_id, candidate_id, m["final_score"], m.get("semantic"), m.get("skill_score"),
+            m.get("location_score"), datetime.utcnow().isoformat())
+
+
+def _trim_job_matches(cur, job_id, keep):
+    kept = f"SELECT candidate_id FROM {MATCH_TABLE} WHERE job_id = ? ORDER BY score DESC LIMIT ?"
+    cur.execute(f"SELECT MAX(score) FROM {MATCH_TABLE} WHERE job_id = ? AND candidate_id NOT IN ({kept})",
+                (job_id, job_id, keep))
+    best_dropped = cur.fetchone()[0]
+    if best_dropped is None:
+        return
+    # the cutoff only rises: everything outside the list scores at most this much
+    cur.execute(f"""
+        INSERT INTO {MATCH_STATE_TABLE} (job_id, cutoff) VALUES (?, ?)
+        ON CONFLICT(job_id) DO UPDATE SET cutoff = MAX(COALESCE(cutoff, excluded.cutoff), excluded.cutoff)
+    """, (job_id, best_dropped))
+    cur.execute(f"DELETE FROM {MATCH_TABLE} WHERE job_id = ? AND candidate_id NOT IN ({kept})",
+                (job_id, job_id, keep))
+
+
+def replace_job_matches(job_id: str, matches: list, keep: int, cutoff: float = None):
+    """
+    Replace the stored list for a job. matches: [(candidate_id, score dict)], best first;
+    cutoff: best score among the candidates not passed in (None if there are none).
+    """
+    init_db()
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM {MATCH_TABLE} WHERE job_id = ?", (job_id,))
+    cur.executemany(f"INSERT INTO {MATCH_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [_match_values(job_id, cid, m) for cid, m in matches])
+    cur.execute(f"INSERT OR REPLACE INTO {MATCH_STATE_TABLE} (job_id, cutoff) VALUES (?, ?)", (job_id, cutoff))
+    _trim_job_matches(cur, job_id, keep)
+    conn.commit()
+    conn.close()
+
+
+def upsert_job_match(job_id: str, candidate_id: str, match: dict, keep: int):
+    """Insert/refresh one candidate's score for a job and keep only the job's best `keep` rows."""
+    init_db()
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(f"INSERT OR REPLACE INTO {MATCH_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                _match_values(job_id, candidate_id, match))
+    _trim_job_matches(cur, job_id, keep)
+    conn.commit()
+    conn.close()
+
+
+def get_job_match_cutoff(job_id: str):
+    init_db()
+    conn = get_conn()
+    row = conn.execute(f"SELECT cutoff FROM {MATCH_STATE_TABLE} WHERE job_id = ?", (job_id,)).fetchone()
+    conn.close()
+    return row["cutoff"] if row else None
+
+
+def get_job_matches(job_id: str, limit: int = None):
+    init_db()
+    conn = get_conn()
+    cur = conn.cursor()
+    sql = f"""
+        SELECT candidate_id, score, semantic, skill_score, location_score, updated_at
+        FROM {MATCH_TABLE} WHERE job_id = ? ORDER BY score DESC
+    """
+    params = (job_id,)
+    if limit:
+        sql += " LIMIT ?"
+        params = (job_id, limit)
+    cur.execute(sql, params)
+    matches = [dict(r) for r in cur.fetchall()]
+    conn.close()
+    # candidate rows may live in other shard files, so join in Python
+    cands = get_candidates_by_ids([m["candidate_id"] for m in matches])
+    rows = []
+    for m in matches:
+        c = cands.get(m["candidate_id"])
+        if not c:
+            continue
+        m.update({k: c.get(k) for k in ("name", "email", "location", "experience", "skills_json", "skills")})
+        rows.append(m)
+    return rows
 
 
-def query_candidates(where: str = "", params: tuple = ()):
+def count_job_matches(job_id: str = None, min_score: float = None):
     init_db()
     conn = get_conn()
     cur = conn.cursor()
-    sql = f"SELECT * FROM {TABLE}"
-    if where:
-        sql += f" WHERE {where}"
-    cur.execute(sql, params or ())
-    rows = cur.fetchall()
-    cols = [c[0] for c in cur.description] if cur.description else []
-    conn.close()
-    return [_parse_skills_field(dict(zip(cols, r))) for r in rows]
+    if job_id and min_score is not None:
+        cur.execute(f"SELECT COUNT(*) FROM {MATCH_TABLE} WHERE job_id = ? AND score >= ?", (job_id, min_score))
+    elif job_id:
+        cur.execute(f"SELECT COUNT(*) FROM {MATCH_TABLE} WHERE job_id = ?", (job_id,))
+    else:
+        cur.execute(f"SELECT COUNT(*) FROM {MATCH_TABLE}")
+    n = cur.fetchone()[0]
+    conn.close()
+    return n
+
+
+# -------------------- Near-duplicates (MinHash / LSH) --------------------
+def save_signature(candidate_id: str, signature: bytes, buckets):
+    """Store a candidate's MinHash signature and replace its LSH buckets. buckets: [(band, bucket)]."""
+    init_db()
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(f"INSERT OR REPLACE INTO {MINHASH_TABLE} (candidate_id, signature) VALUES (?, ?)",
+                (candidate_id, signature))
+    cur.execute(f"DELETE FROM {LSH_TABLE} WHERE candidate_id = ?", (candidate_id,))
+    cur.executemany(f"INSERT OR IGNORE INTO {LSH_TABLE} (band, bucket, candidate_id) VALUES (?, ?, ?)",
+                    [(b, h, candidate_id) for b, h in buckets])
+    conn.commit()
+    conn.close()
+
+
+def lsh_candidates(buckets):
+    """{candidate_id: signature} of every candidate sharing at least one (band, bucket) with buckets."""
+    buckets = list(buckets)
+    if not buckets:
+        return {}
+    init_db()
+    conn = get_conn()
+    out = {}
+    for i in range(0, len(buckets), 400):
+        chunk = buckets[i:i + 400]
+        cur = conn.execute(f"""
+            SELECT s.candidate_id, s.signature FROM {MINHASH_TABLE} s
+            WHERE s.candidate_id IN (
+                SELECT candidate_id FROM {LSH_TABLE}
+                WHERE (band, bucket) IN (VALUES {','.join('(?, ?)' for _ in chunk)})
+            )
+        """, [x for pair in chunk for x in pair])
+        out.update((r["candidate_id"], r["signature"]) for r in cur.fetchall())
+    conn.close()
+    return out
+
+
+def clear_signatures():
+    init_db()
+    conn = get_conn()
+    conn.execute(f"DELETE FROM {MINHASH_TABLE}")
+    conn.execute(f"DELETE FROM {LSH_TABLE}")
+    conn.commit()
+    conn.close()
+
+
+def record_duplicate(candidate_id: str, duplicate_of: str, similarity: float, policy: str):
+    init_db()
+    conn = get_conn()
+    conn.execute(f"""
+        INSERT INTO {DUP_TABLE} (candidate_id, duplicate_of, similarity, policy) VALUES (?, ?, ?, ?)
+        ON CONFLICT(candidate_id) DO UPDATE SET duplicate_of=excluded.duplicate_of,
+            similarity=excluded.similarity, policy=excluded.policy
+    """, (candidate_id, duplicate_of, similarity, policy))
+    conn.commit()
+    conn.close()
+
+
+def duplicate_root(candidate_id: str):
+    """The candidate this one is recorded as a duplicate of (or itself)."""
+    init_db()
+    conn = get_conn()
+    row = conn.execute(f"SELECT duplicate_of FROM {DUP_TABLE} WHERE candidate_id = ?", (candidate_id,)).fetchone()
+    conn.close()
+    return row["duplicate_of"] if row else candidate_id
+
+
+def get_duplicate_links(ids, policy: str = "link"):
+    """{candidate_id: duplicate_of} for the given ids recorded under policy."""
+    ids = list(dict.fromkeys(ids or []))
+    if not ids:
+        return {}
+    init_db()
+    conn = get_conn()
+    out = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        cur = conn.execute(f"""
+            SELECT candidate_id, duplicate_of FROM {DUP_TABLE}
+            WHERE policy = ? AND candidate_id IN ({','.join('?' * len(chunk))})
+        """, [policy, *chunk])
+        out.update((r["candidate_id"], r["duplicate_of"]) for r in cur.fetchall())
+    conn.close()
+    return out
+
+
+def list_duplicates(policy: str = None):
+    init_db()
+    conn = get_conn()
+    sql = f"SELECT candidate_id, duplicate_of, similarity, policy, created_at FROM {DUP_TABLE}"
+    params = ()
+    if policy:
+        sql += " WHERE policy = ?"
+        params = (policy,)
+    rows = [dict(r) for r in conn.execute(sql + " ORDER BY created_at DESC", params).fetchall()]
+    conn.close()
+    return rows
+
+
+# -------------------- Tombstones --------------------
+def tombstone_candidate(candidate_id: str):
+    """
+    Mark a candidate deleted: the row stays (with deleted_at) until compaction purges it; its FTS
+    entry, job match rows, near-duplicate postings and cached resume extraction are removed now, and
+    its email / text hash are released so the same person can apply again as a new candidate.
+    Returns its shard, or None if there is no live candidate with that id.
+    """
+    init_db()
+    now = datetime.utcnow().isoformat()
+    shard, file_hash = None, None
+    for s in _candidate_shards(candidate_id):
+        conn = get_conn(s)
+        cur = conn.cursor()
+        row = cur.execute(f"SELECT file_hash FROM {TABLE} WHERE id = ? AND deleted_at IS NULL",
+                          (candidate_id,)).fetchone()
+        cur.execute(f"""
+            UPDATE {TABLE} SET deleted_at = ?, updated_at = ?, email = NULL, text_hash = NULL, file_hash = NULL
+            WHERE id = ? AND deleted_at IS NULL
+        """, (now, now, candidate_id))
+        if cur.rowcount:
+            cur.execute(f"DELETE FROM {FTS_TABLE} WHERE candidate_id = ?", (candidate_id,))
+            shard, file_hash = s, row["file_hash"] if row else None
+        conn.commit()
+        conn.close()
+        if shard is not None:
+            break
+    if shard is None:
+        return None
+    conn = get_conn()
+    for table in (MATCH_TABLE, MINHASH_TABLE, LSH_TABLE, DUP_TABLE):
+        conn.execute(f"DELETE FROM {table} WHERE candidate_id = ?", (candidate_id,))
+    if file_hash:
+        # resume text and embedding must not outlive the candidate
+        conn.execute(f"DELETE FROM {CACHE_TABLE} WHERE file_hash = ?", (file_hash,))
+    conn.commit()
+    conn.close()
+    return shard
+
+
+def count_tombstones(shard: int = None):
+    init_db()
+    n = 0
+    for s in (range(SHARDS) if shard is None else [shard]):
+        conn = get_conn(s)
+        n += conn.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE deleted_at IS NOT NULL").fetchone()[0]
+        conn.close()
+    return n
+
+
+def count_rows(shard: int):
+    """(live, tombstoned) candidate row counts of a shard."""
+    init_db()
+    conn = get_conn(shard)
+    live, tombstoned = conn.execute(f"""
+        SELECT COUNT(*) - COUNT(deleted_at), COUNT(deleted_at) FROM {TABLE}
+    """).fetchone()
+    conn.close()
+    return live, tombstoned
+
+
+def purge_tombstones(shard: int, before: str = None):
+    """Hard-delete a shard's tombstoned rows (deleted before `before`, if given). Returns the count."""
+    init_db()
+    conn = get_conn(shard)
+    sql, params = f"DELETE FROM {TABLE} WHERE deleted_at IS NOT NULL", ()
+    if before:
+        sql, params = sql + " AND deleted_at <= ?", (before,)
+    n = conn.execute(sql, params).rowcount
+    conn.commit()
+    conn.close()
+    return n
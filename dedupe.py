@@ -0,0 +1,15 @@
+# dedupe.py
+# Bulk near-duplicate pass over the existing database (rebuilds the MinHash/LSH index).
+import argparse
+import json
+from services.dedupe import dedupe_all, POLICIES
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Find and resolve near-duplicate resumes")
+    ap.add_argument("--policy", choices=POLICIES, default=None, help="default: dedupe.policy in config.yml")
+    ap.add_argument("--dry-run", action="store_true", help="only report the groups, change nothing")
+    args = ap.parse_args()
+    report = dedupe_all(args.policy, dry_run=args.dry_run)
+    print(json.dumps(report["groups"], indent=2))
+    print(f"{len(report['groups'])} group(s) among {report['candidates']} candidate(s); "
+          f"{report['removed']} removed.")
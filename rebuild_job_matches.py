@@ -0,0 +1,5 @@
+# rebuild_job_matches.py
+from services.job_matcher import rebuild_job_matches
+if __name__ == "__main__":
+    n = rebuild_job_matches()
+    print(f"Rebuilt match lists for {n} open job(s).")
@@ -0,0 +1,13 @@
+# reindex.py
+# Re-embed every candidate into a new index generation and swap it in (resumes an interrupted run).
+import argparse
+from services.reindex import run_reindex
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Re-embed all candidates with zero search downtime")
+    ap.add_argument("--model", default=None, help="embedding model (default: embeddings.model in config.yml)")
+    ap.add_argument("--no-resume", action="store_true", help="ignore an existing checkpoint and start over")
+    args = ap.parse_args()
+    report = run_reindex(args.model, resume=not args.no_resume)
+    print(f"Re-embedded {report['processed']} candidate(s) into generation {report['generation']} "
+          f"in {report['elapsed_s']}s ({report['rate_per_s']}/s).")
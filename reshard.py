@@ -0,0 +1,10 @@
+# reshard.py
+# Move candidates to the sharding layout in config.yml after changing sharding.shards / sharding.key.
+# Stop the server first. If the vector step is interrupted, `python reindex.py --no-resume` rebuilds
+# every vector from SQLite.
+from services.reshard import reshard
+
+if __name__ == "__main__":
+    report = reshard()
+    print(f"Resharded {report['rows']} candidate(s) and {report['vectors']} vector(s) "
+          f"from {report['from'][0]} to {report['to'][0]} shard(s).")
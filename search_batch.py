@@ -0,0 +1,47 @@
+# search_batch.py
+# Run many recruiter queries / job specs against the candidate pool in one pass.
+#   python search_batch.py --open-jobs
+#   python search_batch.py -q "python developer in Pune" -q "senior java aws" --out results.ndjson
+#   python search_batch.py -f queries.txt          (one query per line)
+import argparse
+import json
+import sys
+
+from services.search import batch_items, search_batch
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Batch candidate search")
+    ap.add_argument("-q", "--query", action="append", default=[], help="query text (repeatable)")
+    ap.add_argument("-f", "--file", help="file with one query per line")
+    ap.add_argument("-j", "--job-id", action="append", default=[], help="job id from services/jobs.py (repeatable)")
+    ap.add_argument("--open-jobs", action="store_true", help="add every open job")
+    ap.add_argument("--mode", choices=["semantic", "hybrid"], help="override search.mode from config.yml")
+    ap.add_argument("--top", type=int, default=10, help="results printed per query")
+    ap.add_argument("--out", help="write full NDJSON results here instead of a summary on stdout")
+    args = ap.parse_args()
+
+    queries = list(args.query)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            queries += [line.strip() for line in f if line.strip()]
+    try:
+        items = batch_items(queries, args.job_id, args.open_jobs)
+    except KeyError as e:
+        sys.exit(f"job not found: {e.args[0]}")
+    if not items:
+        sys.exit("nothing to search: pass -q, -f, -j or --open-jobs")
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    for res in search_batch(items, mode=args.mode):
+        if out:
+            out.write(json.dumps(res, default=str) + "\n")
+            continue
+        label = f"[{res['job_id']}] " if res.get("job_id") else ""
+        print(f"\n{label}{res['query']}  ({len(res['results'])} results)")
+        for r in res["results"][:args.top]:
+            c = r["candidate"]
+            print(f"  {r['match_percent']:6.2f}%  {c.get('name')}  <{c.get('email')}>  {c.get('location')}  "
+                  f"{c.get('experience')} yrs")
+    if out:
+        out.close()
+        print(f"Results written to {args.out}")
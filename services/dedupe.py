@@ -0,0 +1,224 @@
+# services/dedupe.py
+# Near-duplicate resumes. Every ingested resume gets a MinHash signature over word shingles; the
+# signature is cut into LSH bands and each band hashed into a bucket (both stored in SQLite), so the
+# resumes sharing a bucket are the only ones compared. A match whose estimated Jaccard similarity
+# reaches dedupe.threshold is handled by dedupe.policy:
+#   merge - the upload overwrites the earlier candidate (same id, no new candidate)
+#   link  - a new candidate is kept but linked to the earlier one; search shows one per group
+#   flag  - a new candidate is kept and the pair is recorded for review
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+from config.config_loader import section
+from services.metrics import inc, timed
+from db.db import (upsert_candidate, merge_candidate, find_existing_candidate, save_signature,
+                   lsh_candidates, record_duplicate, duplicate_root, clear_signatures,
+                   iter_candidate_chunks, get_candidates_by_ids, SHARDS)
+
+
+def dedupe_cfg():
+    # enabled / policy / threshold are read per call (hot reload); the signature shape below is fixed
+    return section("dedupe")
+
+
+def _threshold():
+    return float(dedupe_cfg().get("threshold", 0.85))
+
+
+SHINGLE = int(dedupe_cfg().get("shingle_size", 5))
+NUM_PERM = int(dedupe_cfg().get("num_perm", 128))
+BANDS = int(dedupe_cfg().get("bands", 32))
+ROWS = NUM_PERM // BANDS
+POLICIES = ("merge", "link", "flag")
+
+_PRIME = np.uint64((1 << 61) - 1)
+# fixed seed: signatures must agree across processes and restarts
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_WORD_RE = re.compile(r"\w+")
+
+
+def _shingles(text: str):
+    tokens = _WORD_RE.findall((text or "").lower())
+    if len(tokens) <= SHINGLE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + SHINGLE]) for i in range(len(tokens) - SHINGLE + 1)}
+
+
+def signature(text: str):
+    """MinHash signature (uint32[num_perm]) of the resume text, or None for empty text."""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    sig = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i in range(0, len(h), 2048):  # bounded (chunk x num_perm) working set for long resumes
+        chunk = h[i:i + 2048]
+        sig = np.minimum(sig, ((np.outer(chunk, _A) + _B) % _PRIME).min(axis=0))
+    return (sig & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def bands(sig):
+    """[(band, bucket)]: each ROWS-wide slice of the signature hashed to a signed 64-bit bucket id."""
+    out = []
+    for b in range(BANDS):
+        digest = hashlib.blake2b(sig[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=8).digest()
+        out.append((b, int.from_bytes(digest, "big", signed=True)))
+    return out
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity: fraction of equal signature slots."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def find_near_duplicates(sig, exclude=None):
+    """[(candidate_id, similarity)] at or above the threshold, best first."""
+    if sig is None:
+        return []
+    out, threshold = [], _threshold()
+    for cid, blob in lsh_candidates(bands(sig)).items():
+        if cid == exclude:
+            continue
+        sim = similarity(sig, np.frombuffer(blob, dtype=np.uint32))
+        if sim >= threshold:
+            out.append((cid, sim))
+    out.sort(key=lambda x: x[1], reverse=True)
+    return out
+
+
+def index_candidate(candidate_id: str, sig):
+    if sig is not None:
+        save_signature(candidate_id, sig.tobytes(), bands(sig))
+
+
+def ingest_candidate(candidate: dict, policy: str = None):
+    """
+    upsert_candidate with near-duplicate handling.
+    Returns (candidate_id, is_new, duplicate) where duplicate is {"of", "similarity", "policy"} or None.
+    """
+    if not dedupe_cfg().get("enabled", True):
+        cid, is_new = upsert_candidate(candidate)
+        return cid, is_new, None
+    policy = policy or dedupe_cfg().get("policy", "flag")
+
+    with timed("dedupe"):
+        sig = signature(candidate.get("raw_text"))
+        dup = None
+        # an exact email / text match is an ordinary update, not a near-duplicate
+        if find_existing_candidate(candidate.get("email"), candidate.get("raw_text")) is None:
+            hits = find_near_duplicates(sig)
+            if hits:
+                dup = {"of": duplicate_root(hits[0][0]), "similarity": round(hits[0][1], 4), "policy": policy}
+                inc("near_duplicates")
+
+    if dup and policy == "merge":
+        cid, is_new = merge_candidate(dup["of"], candidate), False
+    else:
+        cid, is_new = upsert_candidate(candidate)
+        if dup and cid != dup["of"]:
+            record_duplicate(cid, dup["of"], dup["similarity"], policy)
+    index_candidate(cid, sig)
+    return cid, is_new, dup
+
+
+# -------------------- Bulk pass --------------------
+def _groups(pairs, ids):
+    parent = {i: i for i in ids}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[rb] = ra
+    groups = {}
+    for i in ids:
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def dedupe_all(policy: str = None, dry_run: bool = False, progress=print):
+    """
+    Re-sign every candidate, rebuild the LSH index, and apply the policy to each near-duplicate group.
+    The earliest-created candidate of a group is kept as the canonical one; under "merge" it takes
+    the most recently updated resume and the others are deleted (tombstoned, like DELETE /candidate).
+    """
+    policy = policy or dedupe_cfg().get("policy", "flag")
+    if policy not in POLICIES:
+        raise ValueError(f"unknown dedupe policy: {policy}")
+    if not dry_run:
+        clear_signatures()
+
+    sigs, buckets = {}, {}
+    for shard in range(SHARDS):
+        for rows in iter_candidate_chunks(shard):
+            for r in rows:
+                sig = signature(r.get("raw_text"))
+                if sig is None:
+                    continue
+                sigs[r["id"]] = sig
+                for key in bands(sig):
+                    buckets.setdefault(key, []).append(r["id"])
+                if not dry_run:
+                    index_candidate(r["id"], sig)
+    progress(f"[DEDUPE] signed {len(sigs)} candidates")
+
+    # only candidates sharing a bucket are compared
+    sims = {}
+    for members in buckets.values():
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                pair = (min(a, b), max(a, b))
+                if pair not in sims:
+                    sims[pair] = similarity(sigs[a], sigs[b])
+    groups = _groups([p for p, sim in sims.items() if sim >= _threshold()], list(sigs))
+
+    rows = get_candidates_by_ids([cid for g in groups for cid in g])
+    report = {"policy": policy, "dry_run": dry_run, "candidates": len(sigs), "groups": [], "removed": 0}
+    for g in groups:
+        g = [cid for cid in g if cid in rows]
+        if len(g) < 2:
+            continue
+        g.sort(key=lambda c: (str(rows[c].get("created_at") or ""), c))
+        canonical, others = g[0], g[1:]
+        report["groups"].append({"canonical": canonical, "duplicates": others})
+        if dry_run:
+            continue
+        if policy == "merge":
+            newest = max(g, key=lambda c: str(rows[c].get("updated_at") or ""))
+            _remove(others)  # first, so the canonical row can take over their email / text hash
+            report["removed"] += len(others)
+            if newest != canonical:
+                merged = merge_candidate(canonical, rows[newest])
+                index_candidate(merged, sigs[newest])
+                _reembed(merged, rows[newest])
+        else:
+            for cid in others:
+                sim = sims.get((min(cid, canonical), max(cid, canonical)))
+                if sim is None:
+                    sim = similarity(sigs[cid], sigs[canonical])
+                record_duplicate(cid, canonical, round(sim, 4), policy)
+
+    progress(f"[DEDUPE] {len(report['groups'])} near-duplicate group(s), policy {policy}"
+             f"{' (dry run)' if dry_run else ''}")
+    return report
+
+
+def _reembed(candidate_id, row):
+    from chroma.chroma_store import add_or_update_candidate
+    add_or_update_candidate(candidate_id, row.get("raw_text") or "",
+                            metadata={"name": row.get("name"), "email": row.get("email")})
+
+
+def _remove(candidate_ids):
+    from services.tombstones import delete_candidates
+    delete_candidates(candidate_ids)
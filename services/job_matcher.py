@@ -0,0 +1,133 @@
+# services/job_matcher.py
+# Materialized top-N candidates per open job (stored in the job_matches table).
+# Built once from the vector store + candidate skills, then kept current on ingest by scoring
+# only the new candidate against each open job. top_n + margin rows are stored and top_n served;
+# a per-job cutoff (best score of anyone left out) tells when re-scored or deleted members have
+# used up the margin, and the job's list is then rebuilt before it is served.
+import numpy as np
+
+from config.config_loader import section
+from services.jobs import list_open_jobs
+from services.skill_extractor import normalize_skill
+from services.metrics import timed
+from db.db import (query_candidates, replace_job_matches, upsert_job_match, count_job_matches,
+                   get_job_match_cutoff, get_job_matches)
+from chroma.chroma_store import encode, get_all_vectors, live_model_name
+
+
+def match_cfg():
+    return section("job_matching")
+
+
+def top_n():
+    return int(match_cfg().get("top_n", 50))
+
+
+def _keep():
+    return top_n() + int(match_cfg().get("margin", 10))
+
+
+_job_vecs = {}  # job_id -> (job text, model, unit vector); re-encoded if the text or the live model changes
+
+
+def _job_text(job):
+    return f"{job.get('title', '')} in {job.get('location', '')}. Skills: {', '.join(job.get('skills', []))}"
+
+
+def _unit(vec):
+    vec = np.asarray(vec, dtype=float)
+    n = np.linalg.norm(vec)
+    return vec / n if n else vec
+
+
+def _job_vector(job):
+    text, model = _job_text(job), live_model_name()
+    hit = _job_vecs.get(job["id"])
+    if hit and hit[:2] == (text, model):
+        return hit[2]
+    vec = _unit(encode([text], model)[0])
+    _job_vecs[job["id"]] = (text, model, vec)
+    return vec
+
+
+def _skill_set(skills):
+    return {normalize_skill(s).lower() for s in (skills or []) if s}
+
+
+def _score(job, job_skills, semantic, cand_skills, cand_location):
+    skill_score = (len(job_skills & cand_skills) / len(job_skills)) if job_skills else 0.0
+    loc = (job.get("location") or "").lower()
+    location_score = 1.0 if loc and loc == (cand_location or "").strip().lower() else 0.0
+    cfg = match_cfg()
+    final_score = (
+            cfg.get("semantic_weight", 0.5) * semantic +
+            cfg.get("skill_weight", 0.4) * skill_score +
+            cfg.get("location_weight", 0.1) * location_score
+    )
+    return {"semantic": float(semantic), "skill_score": skill_score,
+            "location_score": location_score, "final_score": float(final_score)}
+
+
+def rebuild_job_matches(job_ids=None):
+    """Recompute the full top-N list for the given open jobs (all open jobs by default)."""
+    jobs = [j for j in list_open_jobs() if job_ids is None or j["id"] in job_ids]
+    if not jobs:
+        return 0
+    rows = query_candidates()
+    vecs = get_all_vectors()
+    keep = _keep()
+    if not rows:
+        for job in jobs:
+            replace_job_matches(job["id"], [], keep)
+        return len(jobs)
+
+    with timed("job_match_rebuild"):
+        ids = [r["id"] for r in rows]
+        cand_skills = [_skill_set(r.get("skills")) for r in rows]
+        dim = len(next(iter(vecs.values()))) if vecs else 0
+        # candidates without a stored vector get a zero row (semantic score 0)
+        mat = np.zeros((len(rows), dim))
+        for i, cid in enumerate(ids):
+            if cid in vecs:
+                mat[i] = _unit(vecs[cid])
+        for job in jobs:
+            job_skills = _skill_set(job.get("skills"))
+            sims = mat @ _job_vector(job) if dim else np.zeros(len(rows))
+            scored = [(cid, _score(job, job_skills, sims[i], cand_skills[i], rows[i].get("location")))
+                      for i, cid in enumerate(ids)]
+            scored.sort(key=lambda x: x[1]["final_score"], reverse=True)
+            cutoff = scored[keep][1]["final_score"] if len(scored) > keep else None
+            replace_job_matches(job["id"], scored[:keep], keep, cutoff)
+    return len(jobs)
+
+
+def ensure_job_matches():
+    """Build lists for open jobs that have never been materialized."""
+    missing = [j["id"] for j in list_open_jobs() if count_job_matches(j["id"]) == 0]
+    if missing:
+        rebuild_job_matches(missing)
+    return missing
+
+
+def update_matches_for_candidate(candidate_id: str, candidate: dict, vec):
+    """Score one (new or updated) candidate against every open job and merge into the stored lists."""
+    with timed("job_match_update"):
+        cand_vec = _unit(vec) if vec is not None else None
+        cand_skills = _skill_set(candidate.get("skills"))
+        keep = _keep()
+        for job in list_open_jobs():
+            semantic = float(np.dot(_job_vector(job), cand_vec)) if cand_vec is not None else 0.0
+            match = _score(job, _skill_set(job.get("skills")), semantic, cand_skills, candidate.get("location"))
+            upsert_job_match(job["id"], candidate_id, match, keep)
+
+
+def get_matches(job_id: str, limit: int = None):
+    """
+    A job's served list (at most top_n). Stored rows scoring below the cutoff may be beaten by a
+    candidate that is not stored; if fewer than the requested count are above it, rebuild first.
+    """
+    n = min(limit, top_n()) if limit else top_n()
+    cutoff = get_job_match_cutoff(job_id)
+    if cutoff is not None and count_job_matches(job_id, min_score=cutoff) < n:
+        rebuild_job_matches([job_id])
+    return get_job_matches(job_id, n)
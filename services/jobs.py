@@ -1,7 +1,9 @@
 # services/jobs.py
 JOBS = [
-    {"id": "job1", "title": "Senior Java Developer", "location": "Pune", "skills": ["Java", "Spring Boot", "AWS"]},
-    {"id": "job2", "title": "Data Scientist", "location": "Bangalore", "skills": ["Python", "TensorFlow", "PyTorch"]}
+    {"id": "job1", "title": "Senior Java Developer", "location": "Pune", "skills": ["Java", "Spring Boot", "AWS"],
+     "status": "open"},
+    {"id": "job2", "title": "Data Scientist", "location": "Bangalore", "skills": ["Python", "TensorFlow", "PyTorch"],
+     "status": "open"}
 ]
 
 
@@ -9,6 +11,10 @@ def list_jobs():
     return JOBS
 
 
+def list_open_jobs():
+    return [j for j in JOBS if j.get("status", "open") == "open"]
+
+
 def get_job(job_id):
     for j in JOBS:
         if j["id"] == job_id:
@@ -0,0 +1,123 @@
+# services/metrics.py
+# Lightweight in-process instrumentation: per-stage latency histograms, counters and gauges,
+# rendered in Prometheus text format for the /metrics endpoint.
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from config.config_loader import CONFIG
+
+METRICS_CFG = CONFIG.get("metrics", {}) or {}
+ENABLED = METRICS_CFG.get("enabled", True)
+PREFIX = METRICS_CFG.get("prefix", "skillmatch")
+BUCKETS = tuple(sorted(METRICS_CFG.get("buckets") or
+                       [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]))
+
+_lock = threading.Lock()
+_histograms = {}  # stage -> [per-bucket counts (last slot is +Inf), sum, count]
+_counters = {}
+_gauges = {}
+
+
+def observe(stage: str, seconds: float):
+    if not ENABLED:
+        return
+    idx = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        h = _histograms.get(stage)
+        if h is None:
+            h = _histograms[stage] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        h[0][idx] += 1
+        h[1] += seconds
+        h[2] += 1
+
+
+@contextmanager
+def timed(stage: str):
+    """with timed("vector_scan"): ...  -- records the block's wall time under that stage."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def inc(name: str, value: float = 1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value: float):
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+
+
+def drain():
+    """Snapshot and reset this process's histograms and counters (worker processes hand these to the server)."""
+    with _lock:
+        snap = {"histograms": {k: ([*v[0]], v[1], v[2]) for k, v in _histograms.items()},
+                "counters": dict(_counters)}
+        _histograms.clear()
+        _counters.clear()
+    return snap
+
+
+def merge(snap):
+    """Fold a drain() snapshot from another process into this one's histograms and counters."""
+    if not ENABLED or not snap:
+        return
+    with _lock:
+        for stage, (counts, total, n) in snap.get("histograms", {}).items():
+            h = _histograms.get(stage)
+            if h is None:
+                h = _histograms[stage] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+            h[0] = [a + b for a, b in zip(h[0], counts)]
+            h[1] += total
+            h[2] += n
+        for name, value in snap.get("counters", {}).items():
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def _fmt(v) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def render_prometheus() -> str:
+    with _lock:
+        hists = {k: ([*v[0]], v[1], v[2]) for k, v in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    hname = f"{PREFIX}_stage_seconds"
+    lines.append(f"# HELP {hname} Wall time spent per pipeline stage.")
+    lines.append(f"# TYPE {hname} histogram")
+    for stage in sorted(hists):
+        counts, total, n = hists[stage]
+        cum = 0
+        for le, c in zip(BUCKETS, counts):
+            cum += c
+            lines.append(f'{hname}_bucket{{stage="{stage}",le="{le}"}} {cum}')
+        lines.append(f'{hname}_bucket{{stage="{stage}",le="+Inf"}} {n}')
+        lines.append(f'{hname}_sum{{stage="{stage}"}} {_fmt(total)}')
+        lines.append(f'{hname}_count{{stage="{stage}"}} {n}')
+
+    for name in sorted(counters):
+        cname = f"{PREFIX}_{name}_total"
+        lines.append(f"# TYPE {cname} counter")
+        lines.append(f"{cname} {_fmt(counters[name])}")
+
+    for name in sorted(gauges):
+        gname = f"{PREFIX}_{name}"
+        lines.append(f"# TYPE {gname} gauge")
+        lines.append(f"{gname} {_fmt(gauges[name])}")
+
+    return "\n".join(lines) + "\n"
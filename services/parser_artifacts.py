@@ -0,0 +1,268 @@
+# services/parser_artifacts.py
+# Everything the query parser and skill extractor derive from config.yml + skills_dict.json, built
+# once into one immutable ParserArtifacts object: precompiled regexes, seniority table, city token
+# trie, skill normalization index and the skill-matching automaton. Requests only read current();
+# /admin/reload or the file watcher builds a fresh object in the background and swaps the module
+# reference (a single assignment), so dictionary edits never need a restart or block a request.
+import difflib
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime
+
+from config import config_loader
+from config.config_loader import CONFIG, SKILLS_DICT
+
+_WORD_RE = re.compile(r"\w+")
+_NORMALIZE_CACHE_MAX = 10000
+
+
+def _canonical_map(skills_cfg):
+    """canonical skill -> set of lowercase synonyms (same rules the extractor always used)."""
+    canon_map = {}
+    if not skills_cfg:
+        return {}
+    if isinstance(skills_cfg, dict) and "skills" in skills_cfg:
+        skills = skills_cfg.get("skills", [])
+        norm = {k.lower(): v for k, v in skills_cfg.get("normalization_map", {}).items()}
+        for s in skills:
+            canon_map.setdefault(s, set()).add(s.lower())
+        for variant, canon in norm.items():
+            canon_map.setdefault(canon, set()).add(variant.lower())
+            canon_map.setdefault(canon, set()).add(canon.lower())
+    else:
+        # fallback: old mapping style
+        norm = {k.lower(): v for k, v in (skills_cfg or {}).items()}
+        for variant, canon in norm.items():
+            canon_map.setdefault(canon, set()).add(variant.lower())
+            canon_map.setdefault(canon, set()).add(canon.lower())
+    for canon, s in list(canon_map.items()):
+        s.add(canon.lower())
+        canon_map[canon] = set(s)
+    return canon_map
+
+
+class ParserArtifacts:
+    def __init__(self, config: dict, skills_dict: dict, key=None):
+        self.key = key
+        self.built_at = datetime.utcnow().isoformat()
+
+        # -------- query parser --------
+        self.seniority_aliases = [(re.compile(p), r) for p, r in [
+            (r"\bsr[\.\s]", "senior "),
+            (r"\bjr[\.\s]", "junior "),
+            (r"\bmid[\.\s]", "mid "),
+            (r"\blead[\.\s]", "lead "),
+            (r"\bfresher[\.\s]?", "fresher "),
+        ]]
+        self.years_plus_re = re.compile(r'(\d{1,2})\s*\+\s*(?:years|yrs|year)?')
+        self.years_re = re.compile(r'(\d{1,2})\s*(?:years|yrs|year)')
+        self.split_re = re.compile(r'[\s,/;|]+')
+        self.titles = ["developer", "engineer", "analyst", "manager", "architect"]
+        exp_map = config.get("experience_ranges", {}) or {}
+        self.seniority = [(k, k.lower(), (exp_map.get(k) or {}).get("min"), (exp_map.get(k) or {}).get("max"))
+                          for k in ["Fresher", "Junior", "Mid", "Senior", "Lead"]]
+
+        # city token trie: token -> {..., None: (config order, city)}; earliest-listed city wins
+        self.city_trie = {}
+        self.n_cities = len(config.get("cities", []) or [])
+        for order, city in enumerate(config.get("cities", []) or []):
+            tokens = _WORD_RE.findall(str(city or "").lower())
+            if not tokens:
+                continue
+            node = self.city_trie
+            for t in tokens:
+                node = node.setdefault(t, {})
+            node.setdefault(None, (order, city))
+
+        # -------- skill normalization --------
+        # fingerprint of the dictionary: cached extraction results are reused only while it matches
+        self.skills_key = hashlib.sha256(json.dumps(skills_dict, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self.norm_map = skills_dict.get("normalization_map", {}) or {}
+        self.skills = list(skills_dict.get("skills", []))
+        self.known = [s.lower() for s in self.skills]
+        self._normalized = {}
+
+        # -------- skill automaton --------
+        # every synonym compiled once and indexed by its first word token, so a text only runs the
+        # patterns whose first token it actually contains
+        self.canon_order = {}
+        self.token_index = {}
+        self.unindexed = []
+        for order, (canon, syns) in enumerate(_canonical_map(skills_dict).items()):
+            self.canon_order[canon] = order
+            for syn in sorted(syns, key=lambda x: -len(x)):
+                syn_re = re.escape(syn).replace(r'\ ', r'\s+')
+                # allow dots and + inside token by not breaking them
+                entry = (canon, re.compile(r'(?<!\w)' + syn_re + r'(?!\w)'))
+                first = _WORD_RE.search(syn)
+                if first:
+                    self.token_index.setdefault(first.group(0), []).append(entry)
+                else:
+                    self.unindexed.append(entry)
+
+    # -------- query parser helpers --------
+    def explicit_years(self, nl: str):
+        if not nl:
+            return None, None
+        m = self.years_plus_re.search(nl)
+        if m:
+            return int(m.group(1)), 50  # treat "3+" as 3 to 50
+        m = self.years_re.search(nl)
+        if m:
+            n = int(m.group(1))
+            return n, n
+        return None, None
+
+    def seniority_of(self, nl_lower: str):
+        for key, key_l, mn, mx in self.seniority:
+            if key_l in nl_lower:
+                return key, mn, mx
+        return None, None, None
+
+    def expand_aliases(self, nl_lower: str):
+        for pattern, replacement in self.seniority_aliases:
+            nl_lower = pattern.sub(replacement, nl_lower)
+        return nl_lower
+
+    def find_city(self, nl_lower: str):
+        tokens = _WORD_RE.findall(nl_lower)
+        best = None
+        for i in range(len(tokens)):
+            node = self.city_trie
+            for t in tokens[i:]:
+                node = node.get(t)
+                if node is None:
+                    break
+                if None in node and (best is None or node[None][0] < best[0]):
+                    best = node[None]
+        return best[1] if best else None
+
+    # -------- skills --------
+    def normalize_skill(self, skill):
+        if not skill:
+            return None
+        if isinstance(skill, str):
+            hit = self._normalized.get(skill)
+            if hit is not None:
+                return hit
+        skill_lower = str(skill).lower().strip()
+        if skill_lower in self.norm_map:
+            out = self.norm_map[skill_lower]
+        else:
+            best = difflib.get_close_matches(skill_lower, self.known, n=1, cutoff=0.85)
+            out = self.skills[self.known.index(best[0])] if best else skill.strip()
+        if isinstance(skill, str):
+            if len(self._normalized) >= _NORMALIZE_CACHE_MAX:
+                self._normalized.clear()
+            self._normalized[skill] = out
+        return out
+
+    def extract_skills(self, text: str):
+        if not text:
+            return []
+        text_l = text.lower()
+        earliest = {}
+        entries = list(self.unindexed)
+        for tok in set(_WORD_RE.findall(text_l)):
+            entries.extend(self.token_index.get(tok, ()))
+        for canon, pattern in entries:
+            m = pattern.search(text_l)
+            if m and (canon not in earliest or m.start() < earliest[canon]):
+                earliest[canon] = m.start()
+        # position first, then dictionary order for ties
+        return sorted(earliest, key=lambda c: (earliest[c], self.canon_order[c]))
+
+    def info(self):
+        return {"key": self.key, "built_at": self.built_at, "skills": len(self.skills),
+                "normalization_entries": len(self.norm_map), "automaton_patterns":
+                    sum(len(v) for v in self.token_index.values()) + len(self.unindexed),
+                "cities": self.n_cities}
+
+
+# -------------------- Current artifact + hot reload --------------------
+_current = None
+_reload_lock = threading.Lock()
+_status = {"running": False, "last_error": None, "failed_key": None, "reloads": 0}
+_watcher = None
+
+
+def current() -> ParserArtifacts:
+    global _current
+    if _current is None:
+        with _reload_lock:
+            if _current is None:
+                _current = ParserArtifacts(CONFIG, SKILLS_DICT, config_loader.source_key())
+    return _current
+
+
+def reload():
+    """Re-read config.yml + skills_dict.json, build new artifacts, then swap them in. Returns their info."""
+    global _current
+    with _reload_lock:
+        _status["running"] = True
+        key = None
+        try:
+            key = config_loader.source_key()  # taken first: an edit during the build triggers another reload
+            config, skills = config_loader.reload()
+            built = ParserArtifacts(config, skills, key)
+            _current = built
+            _status["reloads"] += 1
+            _status["last_error"] = _status["failed_key"] = None
+            print(f"[RELOAD] parser artifacts rebuilt ({len(built.skills)} skills)")
+            return built.info()
+        except Exception as e:
+            # the old artifacts stay live
+            _status["last_error"] = f"{type(e).__name__}: {e}"
+            _status["failed_key"] = key
+            print(f"[RELOAD] failed, keeping previous artifacts: {e}")
+            raise
+        finally:
+            _status["running"] = False
+
+
+def reload_async():
+    def _run():
+        try:
+            reload()
+        except Exception:
+            pass
+    threading.Thread(target=_run, name="parser-reload", daemon=True).start()
+
+
+def sync(key):
+    """Bring this process up to the artifacts `key` (used by shard worker processes)."""
+    if key is not None and current().key != key and config_loader.source_key() != _status["failed_key"]:
+        try:
+            reload()
+        except Exception:
+            pass
+
+
+def reload_status():
+    # restart_required: changed settings that are only read at startup (config_loader.RESTART_KEYS)
+    return {**_status, "current": current().info(), "restart_required": config_loader.restart_required()}
+
+
+def start_watcher(interval_s: float = None):
+    """Poll config.yml / skills_dict.json and reload when either changes. Idempotent."""
+    global _watcher
+    if _watcher is not None:
+        return _watcher
+    interval_s = interval_s or (CONFIG.get("reload", {}) or {}).get("interval_s", 2.0)
+
+    def _watch():
+        while True:
+            time.sleep(interval_s)
+            try:
+                key = config_loader.source_key()
+                if key != current().key and key != _status["failed_key"]:  # a broken edit is retried once fixed
+                    reload()
+            except Exception:
+                pass
+
+    _watcher = threading.Thread(target=_watch, name="config-watcher", daemon=True)
+    _watcher.start()
+    return _watcher
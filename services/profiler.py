@@ -0,0 +1,169 @@
+# services/profiler.py
+# Opt-in per-request profiling. The HTTP middleware decides whether a request is profiled
+# (random sample, header or query flag); endpoints wrapped with @profiled then run under
+# cProfile and the stats are dumped into a bounded on-disk ring buffer (data/profiles by default).
+#
+# Only one request is profiled at a time; a request marked while another profile is active simply
+# runs unprofiled (counted as profiles_skipped). cProfile hooks the whole thread (on 3.12+ the whole
+# interpreter), so an async endpoint's profile also records every other coroutine the event loop
+# runs meanwhile -- profile one request at a time on a quiet server for a clean flame graph.
+import asyncio
+import contextvars
+import cProfile
+import functools
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from config.config_loader import section
+from services.metrics import inc
+
+
+def profile_cfg():
+    # read per call so /admin/reload can switch profiling on/off or change the sample rate
+    return section("profiling")
+
+
+def _profile_dir() -> Path:
+    return Path(profile_cfg().get("directory", "data/profiles"))
+
+
+# <epoch us>_<endpoint>_<duration ms>ms.prof
+_NAME_RE = re.compile(r"^(\d+)_([A-Za-z0-9_]+)_(\d+)ms\.prof$")
+_TRUTHY = {"1", "true", "yes", "on"}
+
+_profile_requested = contextvars.ContextVar("profile_requested", default=False)
+_lock = threading.Lock()
+_active = threading.Lock()  # held while a profile is running
+
+
+def should_profile(request) -> bool:
+    cfg = profile_cfg()
+    if not cfg.get("enabled", True):
+        return False
+    if str(request.headers.get(cfg.get("header", "X-Profile"), "")).lower() in _TRUTHY:
+        return True
+    if str(request.query_params.get(cfg.get("query_param", "profile"), "")).lower() in _TRUTHY:
+        return True
+    sample_rate = float(cfg.get("sample_rate", 0.0))
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def mark_request(flag: bool):
+    """Set the per-request flag; returns a token for reset_request()."""
+    return _profile_requested.set(flag)
+
+
+def reset_request(token):
+    _profile_requested.reset(token)
+
+
+def _store(endpoint: str, prof: cProfile.Profile, elapsed: float):
+    profile_dir, max_profiles = _profile_dir(), int(profile_cfg().get("max_profiles", 50))
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    name = f"{time.time_ns() // 1000}_{endpoint}_{int(elapsed * 1000)}ms.prof"
+    with _lock:
+        prof.dump_stats(str(profile_dir / name))
+        # ring buffer: keep only the newest max_profiles dumps
+        files = sorted(p for p in profile_dir.iterdir() if _NAME_RE.match(p.name))
+        for old in files[:-max_profiles] if max_profiles > 0 else files:
+            old.unlink(missing_ok=True)
+    return name
+
+
+def _begin():
+    """Start a profile: (profiler, start time), or None when another profile is already active."""
+    if not _active.acquire(blocking=False):
+        inc("profiles_skipped")
+        return None
+    prof = cProfile.Profile()
+    try:
+        prof.enable()
+    except ValueError:
+        # some other profiling tool (debugger, coverage) owns the hook
+        _active.release()
+        inc("profiles_skipped")
+        return None
+    return prof, time.perf_counter()
+
+
+def _finish(endpoint: str, prof: cProfile.Profile, start: float):
+    try:
+        prof.disable()
+        _store(endpoint, prof, time.perf_counter() - start)
+    finally:
+        _active.release()
+
+
+async def _profiled_body(body, finish):
+    # a StreamingResponse body runs after the endpoint returned; the profile ends with it
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        finish()
+
+
+def profiled(func):
+    """Run the endpoint under cProfile when the current request was marked for profiling."""
+    endpoint = func.__name__
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            started = _begin() if _profile_requested.get() else None
+            if started is None:
+                return await func(*args, **kwargs)
+            finish = functools.partial(_finish, endpoint, *started)
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException:
+                finish()
+                raise
+            body = getattr(result, "body_iterator", None)
+            if body is None:
+                finish()
+                return result
+            result.body_iterator = _profiled_body(body, finish)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = _begin() if _profile_requested.get() else None
+        if started is None:
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _finish(endpoint, *started)
+    return wrapper
+
+
+def list_profiles():
+    profile_dir = _profile_dir()
+    if not profile_dir.exists():
+        return []
+    out = []
+    for p in sorted(profile_dir.iterdir(), reverse=True):
+        m = _NAME_RE.match(p.name)
+        if not m:
+            continue
+        out.append({
+            "name": p.name,
+            "endpoint": m.group(2),
+            "created_us": int(m.group(1)),
+            "duration_ms": int(m.group(3)),
+            "size_bytes": p.stat().st_size,
+        })
+    return out
+
+
+def get_profile_path(name: str):
+    """Resolve a profile name to its file, or None (also rejects anything that is not a profile name)."""
+    if not _NAME_RE.match(name or ""):
+        return None
+    path = _profile_dir() / name
+    return path if path.exists() else None
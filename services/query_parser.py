@@ -0,0 +1,312 @@
+# services/query_parser.py
+# Recruiter query parsing: rule-based fallback parser and the Ollama JSON parser.
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import requests
+
+from config.config_loader import CONFIG, section
+from services.parser_artifacts import current
+from services.metrics import inc
+
+
+def ollama_cfg():
+    # read per call: /admin/reload replaces CONFIG["ollama"]
+    return section("ollama")
+
+
+# -------------------- Helpers --------------------
+def detect_explicit_years(nl: str):
+    return current().explicit_years(nl)
+
+
+def map_seniority(nl_lower: str):
+    return current().seniority_of(nl_lower)
+
+
+# -------------------- Ollama parsing --------------------
+def build_ollama_prompt(nl: str):
+    return f"""
+You are a strict JSON generator. Given a recruiter's natural language query, output a single JSON
+object with keys: title, seniority, must_have (list), any_of (list), location, min_years (int or null), max_years (int or null), raw_query.
+If a field is missing, use null or [].
+Return ONLY the JSON object, nothing else.
+
+Query: \"{nl}\"
+"""
+
+
+def parse_nl_with_ollama(nl: str):
+    """
+    Call Ollama configured in CONFIG. Return a sanitized dict or None.
+    Handles streaming responses and non-stream responses; prints raw output for debug.
+    """
+    if not CONFIG.get("ollama", {}).get("enabled", False):
+        raise RuntimeError("Ollama disabled in config")
+
+    api_url = CONFIG["ollama"]["api_url"]
+    payload = {
+        "model": CONFIG["ollama"].get("model"),
+        "prompt": build_ollama_prompt(nl),
+        # use streaming when supported (some Ollama setups stream JSON chunks)
+        "stream": True,
+        "options": {"num_predict": 256}
+    }
+
+    inc("llm_calls")
+    try:
+        resp = requests.post(api_url, json=payload, stream=True, timeout=20)
+        resp.raise_for_status()
+    except Exception as e:
+        # bubble up so caller can fallback
+        print(f"[OLLAMA] request failed: {e}")
+        return None
+
+    full_text = []
+    try:
+        # Try streaming lines first (common with Ollama)
+        for raw in resp.iter_lines(decode_unicode=True):
+            if not raw:
+                continue
+            line = raw.strip()
+            # many Ollama streaming lines are JSON objects per-line; try parse
+            try:
+                j = json.loads(line)
+            except Exception:
+                # if not JSON, append as-is
+                full_text.append(line)
+                continue
+            # Ollama variants might use "response" or "text"
+            if isinstance(j, dict):
+                if "response" in j and isinstance(j["response"], str):
+                    full_text.append(j["response"])
+                elif "text" in j and isinstance(j["text"], str):
+                    full_text.append(j["text"])
+                elif "choices" in j and isinstance(j["choices"], list):
+                    # some variants use choices -> text
+                    for c in j["choices"]:
+                        if isinstance(c, dict) and "text" in c:
+                            full_text.append(c["text"])
+                # if a done flag exists, break
+                if j.get("done"):
+                    break
+            else:
+                # if j is not dict (unlikely), append raw
+                full_text.append(line)
+    except Exception:
+        # fall back to trying to read full body
+        try:
+            text_body = resp.text
+            full_text.append(text_body)
+        except Exception:
+            pass
+
+    text_out = "".join(full_text).strip()
+
+    if not text_out:
+        # no content
+        return None
+
+    # try to extract a JSON object from the returned text
+    m = re.search(r"\{[\s\S]*\}", text_out)
+    if m:
+        try:
+            parsed = json.loads(m.group(0))
+        except Exception:
+            parsed = None
+    else:
+        # maybe entire output was JSON string (non-stream)
+        try:
+            parsed = json.loads(text_out)
+        except Exception:
+            parsed = None
+
+    # sanitize parsed (normalize None -> empty lists/strings)
+    if not parsed or not isinstance(parsed, dict):
+        return None
+
+    # ensure keys exist and normalized
+    parsed_sanitized = {
+        "title": parsed.get("title") or None,
+        "seniority": parsed.get("seniority") or None,
+        "must_have": parsed.get("must_have") or [],
+        "any_of": parsed.get("any_of") or [],
+        "location": parsed.get("location") or None,
+        "min_years": parsed.get("min_years"),
+        "max_years": parsed.get("max_years"),
+        "raw_query": parsed.get("raw_query") or nl or ""
+    }
+    # ensure lists are lists
+    if parsed_sanitized["must_have"] is None:
+        parsed_sanitized["must_have"] = []
+    if parsed_sanitized["any_of"] is None:
+        parsed_sanitized["any_of"] = []
+
+    return parsed_sanitized
+
+
+def fallback_parser(nl: str):
+    art = current()  # one artifact for the whole parse, even if a reload swaps it meanwhile
+    # normalize common seniority abbreviations
+    nl_lower = art.expand_aliases((nl or "").lower())
+
+    parsed = {
+        "title": None,
+        "seniority": None,
+        "must_have": [],
+        "any_of": [],
+        "location": None,
+        "min_years": None,
+        "max_years": None,
+        "raw_query": nl or ""
+    }
+
+    # seniority mapping
+    s, mn, mx = art.seniority_of(nl_lower)
+    if s:
+        parsed["seniority"] = s
+        parsed["min_years"], parsed["max_years"] = mn, mx
+
+    # explicit years override seniority ranges
+    ey_min, ey_max = art.explicit_years(nl_lower)
+    if ey_min is not None:
+        parsed["min_years"], parsed["max_years"] = ey_min, ey_max
+
+    # skills
+    words = art.split_re.split(nl_lower)
+    seen = set()
+    for w in words:
+        if len(w) < 2:
+            continue
+        norm = art.normalize_skill(w)
+        if norm and norm not in seen:
+            seen.add(norm)
+            parsed["must_have"].append(norm)
+
+    # title
+    for t in art.titles:
+        if t in nl_lower:
+            parsed["title"] = t.title()
+            break
+
+    # location (token trie over config cities)
+    parsed["location"] = art.find_city(nl_lower)
+
+    return parsed
+
+
+# -------------------- Speculative parsing --------------------
+# The rule-based parse and the Ollama parse start together; the Ollama result wins if it lands
+# before the deadline. Ollama calls keep running past the deadline and their result goes into the
+# parse cache, so the next identical query gets LLM quality without waiting.
+_parse_cache = OrderedDict()  # normalized query -> Ollama parse (LRU)
+_inflight = {}  # normalized query -> Future, so concurrent identical queries share one call
+_cache_lock = threading.Lock()
+_llm_pool = None
+
+
+def _cache_key(nl: str):
+    return " ".join((nl or "").lower().split())
+
+
+def get_cached_parse(nl: str):
+    key = _cache_key(nl)
+    with _cache_lock:
+        hit = _parse_cache.get(key)
+        if hit is not None:
+            _parse_cache.move_to_end(key)
+    return dict(hit, raw_query=nl) if hit is not None else None
+
+
+def _cache_parse(key: str, parsed: dict):
+    # caller holds _cache_lock
+    _parse_cache[key] = parsed
+    _parse_cache.move_to_end(key)
+    while len(_parse_cache) > int(ollama_cfg().get("parse_cache_size", 1024)):
+        _parse_cache.popitem(last=False)
+
+
+def _llm_parse(key: str, nl: str):
+    parsed = None
+    try:
+        parsed = parse_nl_with_ollama(nl)
+    except Exception as e:
+        print(f"[OLLAMA] parse error: {e}")
+    finally:
+        # cached before the in-flight entry goes, so an identical query never starts a second call
+        with _cache_lock:
+            if parsed:
+                _cache_parse(key, parsed)
+            _inflight.pop(key, None)
+    return parsed
+
+
+def _submit_llm_parse(nl: str):
+    """Future of the Ollama parse for nl, or None when max_pending calls are already queued or running."""
+    global _llm_pool
+    key = _cache_key(nl)
+    with _cache_lock:
+        fut = _inflight.get(key)
+        if fut is None:
+            # bounded backlog: under a burst, late calls would only pile up past their deadline
+            cfg = ollama_cfg()
+            workers = int(cfg.get("workers", 4))
+            if len(_inflight) >= int(cfg.get("max_pending", 4 * workers)):
+                inc("parse_llm_skipped")
+                return None
+            if _llm_pool is None:
+                _llm_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ollama-parse")
+            fut = _inflight[key] = _llm_pool.submit(_llm_parse, key, nl)
+    return fut
+
+
+def parse_speculative_many(queries, deadline_ms: float = None):
+    """
+    Parse several queries, racing Ollama against fallback_parser under one shared deadline.
+    Returns one parse per query: cached/on-time Ollama parse, else the rule-based one.
+    """
+    deadline_ms = ollama_cfg().get("deadline_ms", 300) if deadline_ms is None else deadline_ms
+    end = time.perf_counter() + deadline_ms / 1000.0
+    llm_on = ollama_cfg().get("enabled", False)
+
+    out, pending = [None] * len(queries), {}
+    for i, q in enumerate(queries):
+        out[i] = get_cached_parse(q)
+        if out[i] is not None:
+            inc("parse_cache_hits")
+        elif llm_on:
+            fut = _submit_llm_parse(q)
+            if fut is not None:
+                pending[i] = fut
+
+    # rule-based parses run here while the Ollama calls are in flight
+    rules = {}
+    for i in range(len(queries)):
+        if out[i] is None:
+            try:
+                rules[i] = fallback_parser(queries[i])
+            except Exception as e:
+                print(f"[PARSE] fallback error: {e}")
+                rules[i] = None
+
+    for i, fut in pending.items():
+        try:
+            parsed = fut.result(timeout=max(0.0, end - time.perf_counter()))
+        except FutureTimeout:
+            inc("parse_deadline_misses")
+            parsed = None
+        if parsed:
+            inc("parse_llm_wins")
+            out[i] = dict(parsed, raw_query=queries[i])
+    for i, parsed in rules.items():
+        if out[i] is None:
+            # both parsers failed: an empty parse (no filters) rather than None
+            out[i] = parsed or {}
+    return out
+
+
+def parse_speculative(nl: str, deadline_ms: float = None):
+    return parse_speculative_many([nl], deadline_ms)[0]
@@ -0,0 +1,262 @@
+# services/reindex.py
+# Zero-downtime re-embedding. Streams candidates from SQLite in chunks, batch-encodes them with the
+# target model into a new index generation (gen_<n>/) while searches keep using the live one, then
+# catches up rows changed during the run and atomically swaps the live pointer. Each chunk is
+# appended to a per-shard part file (merged into vectors.json once per shard) and checkpointed, so
+# an interrupted run resumes where it stopped.
+import json
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from config.config_loader import section
+from services.metrics import set_gauge
+from db.db import SHARDS, iter_candidate_chunks, query_candidates, live_candidate_ids
+import chroma.chroma_store as store
+
+
+def reindex_cfg():
+    return section("embeddings").get("reindex", {}) or {}
+
+
+_lock = threading.Lock()
+_state = {"running": False, "thread": None, "last": None}
+
+
+def _checkpoint_path():
+    return store.PERSIST_DIR / "reindex_checkpoint.json"
+
+
+def _load_checkpoint():
+    p = _checkpoint_path()
+    return json.loads(p.read_text(encoding="utf-8")) if p.exists() else None
+
+
+def _save_checkpoint(ckpt: dict):
+    p = _checkpoint_path()
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps(ckpt), encoding="utf-8")
+    tmp.replace(p)
+
+
+def _existing_generations():
+    gens = [0]
+    for d in store.PERSIST_DIR.glob("gen_*"):
+        try:
+            gens.append(int(d.name.split("_", 1)[1]))
+        except ValueError:
+            pass
+    return sorted(gens)
+
+
+def _encode_rows(rows, model):
+    texts = [r.get("raw_text") or "" for r in rows]
+    return store._get_model(model).encode(texts, batch_size=int(reindex_cfg().get("batch_size", 64)))
+
+
+def _metadata(row, model, generation):
+    return {"name": row.get("name"), "email": row.get("email"), **store.version_tag(model, generation)}
+
+
+def _prune_generations(live_gen: int, previous_gen: int):
+    """Keep the live generation and (with keep_generations >= 2) the one it replaced, for rollback."""
+    keep_previous = int(reindex_cfg().get("keep_generations", 2)) >= 2
+    keep = {live_gen} | ({previous_gen} if keep_previous else set())
+    for gen in _existing_generations():
+        if gen in keep or gen == 0:
+            # generation 0 shares PERSIST_DIR with everything else; its files are left in place
+            continue
+        shutil.rmtree(store.generation_dir(gen), ignore_errors=True)
+
+
+def _report(ckpt: dict, t0: float, **extra):
+    elapsed = ckpt.get("elapsed_s", 0.0) + (time.perf_counter() - t0)
+    rate = ckpt["processed"] / elapsed if elapsed else 0.0
+    set_gauge("reindex_processed", ckpt["processed"])
+    set_gauge("reindex_rate_per_s", round(rate, 2))
+    return {**ckpt, "elapsed_s": round(elapsed, 3), "rate_per_s": round(rate, 2), **extra}
+
+
+def _part_file(shard: int, generation: int):
+    # append-only JSONL of the shard's encoded chunks; merged into vectors.json once the shard is done
+    return store.shard_dir(shard, generation) / "vectors.part.jsonl"
+
+
+def _open_part(shard: int, generation: int, offset: int):
+    """Open the shard's part file for appending, cut back to `offset` (drops a chunk written after the last checkpoint)."""
+    f = _part_file(shard, generation)
+    f.parent.mkdir(parents=True, exist_ok=True)
+    fh = open(f, "a+b")
+    fh.truncate(offset)
+    fh.seek(offset)
+    return fh
+
+
+def _merge_part(shard: int, generation: int):
+    """Fold the shard's part file into the generation's vectors.json / metadata.json (one rewrite per shard)."""
+    f = _part_file(shard, generation)
+    if not f.exists():
+        return
+    vecs = store._load_vectors(shard, generation)
+    metas = store._load_metadata(shard, generation)
+    with open(f, "r", encoding="utf-8") as fh:
+        for line in fh:
+            rec = json.loads(line)
+            vecs[rec["id"]] = rec["vec"]
+            metas[rec["id"]] = rec["meta"]
+    store._save_vectors(vecs, shard, generation)
+    store._save_metadata(metas, shard, generation)
+
+
+def _encode_into(rows, model, generation, shard):
+    """Encode rows into the generation's shard files (used by the catch-up, where deltas are small)."""
+    vecs = store._load_vectors(shard, generation)
+    metas = store._load_metadata(shard, generation)
+    for row, emb in zip(rows, _encode_rows(rows, model)):
+        vecs[row["id"]] = emb
+        metas[row["id"]] = _metadata(row, model, generation)
+    if SHARDS > 1:
+        # rows that changed shard during the run must not linger in their old one
+        moved = {r["id"] for r in rows}
+        for other in range(SHARDS):
+            if other == shard:
+                continue
+            ov, om = store._load_vectors(other, generation), store._load_metadata(other, generation)
+            if moved & set(ov):
+                for cid in moved:
+                    ov.pop(cid, None)
+                    om.pop(cid, None)
+                store._save_vectors(ov, other, generation)
+                store._save_metadata(om, other, generation)
+    store._save_vectors(vecs, shard, generation)
+    store._save_metadata(metas, shard, generation)
+
+
+def _catch_up(since: str, model: str, generation: int):
+    """Re-encode rows updated at or after `since` into the generation. Returns the count."""
+    n = 0
+    for shard in range(SHARDS):
+        rows = query_candidates("updated_at >= ?", (since,), shard=shard)
+        if rows:
+            _encode_into(rows, model, generation, shard)
+            n += len(rows)
+    return n
+
+
+def run_reindex(model: str = None, resume: bool = True, progress=print):
+    """Build a new generation with `model` (default: embeddings.model from config.yml) and swap it in."""
+    model = model or store.MODEL_NAME
+    live = store.live_index()
+    ckpt = _load_checkpoint() if resume else None
+    if ckpt and ckpt.get("model") != model:
+        ckpt = None
+    if not ckpt:
+        generation = max(_existing_generations()) + 1
+        shutil.rmtree(store.generation_dir(generation), ignore_errors=True)
+        ckpt = {"generation": generation, "model": model, "from_generation": live["generation"],
+                "started_at": datetime.utcnow().isoformat(), "shard": 0, "last_id": None,
+                "part_bytes": 0, "processed": 0, "elapsed_s": 0.0}
+        _save_checkpoint(ckpt)
+    generation = ckpt["generation"]
+    progress(f"[REINDEX] generation {generation} with {model} "
+             f"(live: generation {live['generation']} / {live['model']}), resuming at shard {ckpt['shard']}")
+
+    cfg = reindex_cfg()
+    chunk_size = int(cfg.get("chunk_size", 256))
+    t0 = time.perf_counter()
+    for shard in range(ckpt["shard"], SHARDS):
+        resuming = shard == ckpt["shard"]
+        after = ckpt["last_id"] if resuming else None
+        with _open_part(shard, generation, ckpt.get("part_bytes", 0) if resuming else 0) as part:
+            for rows in iter_candidate_chunks(shard, after_id=after, size=chunk_size):
+                embs = _encode_rows(rows, model)
+                for row, emb in zip(rows, embs):
+                    rec = {"id": row["id"], "vec": [float(x) for x in emb],
+                           "meta": _metadata(row, model, generation)}
+                    part.write((json.dumps(rec) + "\n").encode("utf-8"))
+                part.flush()
+                ckpt.update(shard=shard, last_id=rows[-1]["id"], part_bytes=part.tell(),
+                            processed=ckpt["processed"] + len(rows))
+                status = _state["last"] = _report(ckpt, t0)
+                _save_checkpoint(status)
+                progress(f"[REINDEX] shard {shard}: {status['processed']} done, {status['rate_per_s']}/s")
+        _merge_part(shard, generation)
+        ckpt.update(shard=shard + 1, last_id=None, part_bytes=0)
+        _save_checkpoint(_report(ckpt, t0))
+        _part_file(shard, generation).unlink(missing_ok=True)
+
+    # catch up on rows changed during the run without blocking writes, until the delta is small ...
+    since, caught_up = ckpt["started_at"], 0
+    for _ in range(int(cfg.get("catch_up_passes", 3))):
+        pass_start = datetime.utcnow().isoformat()
+        n = _catch_up(since, model, generation)
+        caught_up += n
+        since = pass_start
+        if n <= chunk_size:
+            break
+    # candidates deleted (or deleted and purged by a compaction) during the run were already encoded:
+    # tombstone every id of the new generation that no longer has a live row
+    for shard in range(SHARDS):
+        orphans = set(store._load_metadata(shard, generation)) - live_candidate_ids(shard)
+        store.tombstone_candidates(orphans, shard, generation)
+    # ... then the last delta + swap with live writes paused, so nothing lands in the old generation unseen
+    with store._write_lock:
+        caught_up += _catch_up(since, model, generation)
+        for shard in range(SHARDS):
+            deleted = query_candidates("deleted_at IS NOT NULL AND updated_at >= ?", (since,),
+                                       shard=shard, include_deleted=True)
+            store.tombstone_candidates([r["id"] for r in deleted], shard, generation)
+        store.swap_generation(generation, model)
+
+    _checkpoint_path().unlink(missing_ok=True)
+    _prune_generations(generation, ckpt["from_generation"])
+    status = _report(ckpt, t0, caught_up=caught_up, swapped=True)
+    progress(f"[REINDEX] swapped to generation {generation}: {status['processed']} candidates "
+             f"(+{caught_up} caught up) in {status['elapsed_s']}s, {status['rate_per_s']}/s")
+
+    # materialized job lists hold semantic scores from the old model
+    from services.job_matcher import rebuild_job_matches
+    rebuild_job_matches()
+    return status
+
+
+def start_reindex(model: str = None, resume: bool = True):
+    """Run the re-embedding job in a background thread. Returns False if one is already running."""
+    with _lock:
+        if _state["running"]:
+            return False
+        _state["running"] = True
+
+    def _run():
+        try:
+            _state["last"] = run_reindex(model, resume)
+        except Exception as e:
+            print(f"[REINDEX] failed: {e}")
+            _state["last"] = {**(_state["last"] or {}), "error": str(e)}
+        finally:
+            _state["running"] = False
+        # compaction is deferred while a run is in progress
+        from services.tombstones import maybe_compact
+        maybe_compact()
+
+    t = threading.Thread(target=_run, name="reindex", daemon=True)
+    _state["thread"] = t
+    t.start()
+    return True
+
+
+def reindex_running():
+    return _state["running"]
+
+
+def reindex_status():
+    live = store.live_index()
+    return {
+        "running": _state["running"],
+        "live": live,
+        "configured_model": store.MODEL_NAME,
+        "stale": live["model"] != store.MODEL_NAME,
+        "checkpoint": _load_checkpoint(),
+        "last": _state["last"],
+    }
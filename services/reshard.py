@@ -0,0 +1,32 @@
+# services/reshard.py
+# Move candidate rows and the live generation's vectors to the sharding layout in config.yml
+# (sharding.shards / sharding.key). Run it with the server stopped after changing either setting;
+# until it has run, init_db refuses to start against the old layout.
+import shutil
+
+from db.db import stored_layout, current_layout, reshard_rows, save_layout
+import chroma.chroma_store as store
+
+
+def reshard(progress=print):
+    """Returns {"from", "to", "rows", "vectors"}; a no-op when the stored layout already matches."""
+    old, new = stored_layout(), current_layout()
+    if old == new:
+        progress(f"[RESHARD] already laid out as {new[0]} shard(s)")
+        return {"from": old, "to": new, "rows": 0, "vectors": 0}
+    progress(f"[RESHARD] {old[0]} shard(s) (key {old[1]}) -> {new[0]} shard(s) (key {new[1]})")
+
+    # older generations (kept for rollback) and an unfinished re-embedding run use the old layout
+    live_dir = store.generation_dir(store.live_index()["generation"])
+    for d in store.PERSIST_DIR.glob("gen_*"):
+        if d != live_dir:
+            shutil.rmtree(d, ignore_errors=True)
+    (store.PERSIST_DIR / "reindex_checkpoint.json").unlink(missing_ok=True)
+
+    located = reshard_rows(old)
+    progress(f"[RESHARD] {len(located)} candidate row(s) placed")
+    vectors = store.reshard_vectors(old[0], located)
+    progress(f"[RESHARD] {vectors} vector(s) placed")
+    # recorded last: an interrupted run is simply started again
+    save_layout(new)
+    return {"from": old, "to": new, "rows": len(located), "vectors": vectors}
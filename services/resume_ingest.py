@@ -1,16 +1,64 @@
 # services/resume_ingest.py
-import hashlib, uuid, os
+import hashlib, uuid, os, tempfile
+from pathlib import Path
 from utils.text_extractor import extract_text
-from services.skill_extractor import extract_skills
+from services.parser_artifacts import current
+from db.db import get_cached_extraction, cache_extraction
+from services.metrics import timed, inc
 
 
-def process_resume_file(path, filename=None):
+def save_upload(fileobj, dest_dir, suffix="", max_bytes=None, chunk_size=65536):
+    """
+    Stream an uploaded file to a unique temp file inside dest_dir, hashing the bytes as they go by.
+    Returns (path, sha256 hex digest, size in bytes). Raises ValueError if max_bytes is exceeded.
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(dest_dir), suffix=suffix)
+    tmp = Path(tmp)
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise ValueError(f"upload exceeds {max_bytes} bytes")
+                h.update(chunk)
+                f.write(chunk)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+        raise
+    return tmp, h.hexdigest(), size
+
+
+def process_resume_file(path, filename=None, file_hash=None):
     path = str(path)
-    text = extract_text(path)
-    if not text:
-        text = ""
+    art = current()  # one dictionary for the whole file, even if a reload lands meanwhile
+    # identical files (same byte hash) skip text and skill extraction entirely; skills are re-extracted
+    # from the cached text only when a reload changed skills_dict.json since they were cached
+    cached = get_cached_extraction(file_hash) if file_hash else None
+    if cached and cached["skills_key"] == art.skills_key:
+        inc("extraction_cache_hits")
+        text, skills = cached["raw_text"], cached["skills"]
+    else:
+        if cached:
+            inc("extraction_cache_stale_skills")
+            text = cached["raw_text"]
+        else:
+            inc("extraction_cache_misses")
+            with timed("text_extraction"):
+                text = extract_text(path)
+            if not text:
+                text = ""
+        with timed("skill_extraction"):
+            skills = art.extract_skills(text)
+        if file_hash:
+            cache_extraction(file_hash, text, skills, art.skills_key)
     text_hash = hashlib.md5(text.encode("utf-8")).hexdigest()
-    skills = extract_skills(text)
     # return minimal candidate object
     candidate = {
         "id": str(uuid.uuid4()),
@@ -21,6 +69,7 @@ def process_resume_file(path, filename=None):
         "experience": None,
         "skills": skills,
         "raw_text": text,
-        "text_hash": text_hash
+        "text_hash": text_hash,
+        "file_hash": file_hash
     }
     return candidate
@@ -0,0 +1,294 @@
+# services/search.py
+# Candidate search: parse -> SQL filters -> vector (and, in hybrid mode, FTS5) scores -> ranking.
+# Hybrid mode fuses the vector top-k with the FTS hits and only SQL-filters that shortlist.
+# Used by /search_candidates (one query) and /search_batch + search_batch.py (many queries).
+# With sharding enabled every shard is ranked in a worker process (local top-k) and merged here.
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from config.config_loader import CONFIG, section
+from services.query_parser import fallback_parser, parse_nl_with_ollama, parse_speculative_many, ollama_cfg
+from services.skill_extractor import normalize_skill
+from services.jobs import get_job, list_open_jobs
+from services.metrics import timed, drain, merge
+from services import parser_artifacts
+from db.db import query_candidates, fts_search, get_duplicate_links, get_candidates_by_ids, SHARDS, SHARD_CFG
+from chroma.chroma_store import encode_queries, search_vectors, shard_counts, record_shard_counts
+
+NO_RESULTS = "No results found. Please refine your search."
+MODES = ("semantic", "hybrid")
+
+
+def search_cfg():
+    return section("search")
+
+
+def resolve_mode(mode: str = None):
+    """The request's mode, else search.mode. Raises ValueError for an unknown one."""
+    mode = mode or search_cfg().get("mode", "semantic")
+    if mode not in MODES:
+        raise ValueError(f"unknown search mode {mode!r}; expected one of: {', '.join(MODES)}")
+    return mode
+
+
+_pool = None
+
+
+def parse_queries(queries):
+    """Parse every query; in speculative mode all Ollama calls race one shared deadline."""
+    if ollama_cfg().get("parse_mode", "fallback_first") == "speculative":
+        with timed("parse"):
+            return parse_speculative_many(queries)
+    return [parse_query(q) for q in queries]
+
+
+def parse_query(query: str):
+    if ollama_cfg().get("parse_mode", "fallback_first") == "speculative":
+        return parse_queries([query])[0]
+    with timed("parse"):
+        try:
+            parsed = fallback_parser(query)
+        except Exception as e:
+            print(f"[OLLAMA] parse error: {e}")
+            parsed = None
+
+        if not parsed:
+            parsed = parse_nl_with_ollama(query)
+    return parsed or {}
+
+
+def build_filters(parsed: dict):
+    """Strict SQL filters (location, experience range) -> (where, params)."""
+    where_clauses, params = [], []
+
+    if parsed.get("location"):
+        where_clauses.append("LOWER(location) = LOWER(?)")
+        params.append(parsed["location"])
+
+    if parsed.get("min_years") is not None:
+        mn, mx = parsed.get("min_years"), parsed.get("max_years")
+        if mx is None:
+            mx = mn
+        where_clauses.append("CAST(experience AS INTEGER) BETWEEN ? AND ?")
+        params.extend([mn, mx])
+
+    return " AND ".join(where_clauses), tuple(params)
+
+
+def rank_candidates(parsed: dict, sql_rows: list, vec_map: dict, fused: dict = None):
+    """vec_map holds cosine scores; when fused (hybrid RRF) scores are given they take the semantic weight."""
+    with timed("ranking"):
+        must_skills = [normalize_skill(s).lower() for s in parsed.get("must_have") or []]
+
+        out = []
+        for r in sql_rows:
+            cand_skills = [normalize_skill(s).lower() for s in (r.get("skills") or [])]
+            skill_matches = len([m for m in must_skills if m in cand_skills])
+            skill_score = (skill_matches / len(must_skills)) if must_skills else 0.0
+            sem_score = vec_map.get(r["id"], 0.0)
+            rel_score = fused.get(r["id"], 0.0) if fused is not None else sem_score
+            exp_score = 0.0
+            if parsed.get("min_years") is not None:
+                try:
+                    exp_val = int(r.get("experience") or 0)
+                    mn, mx = parsed.get("min_years"), parsed.get("max_years") or parsed.get("min_years")
+                    exp_score = 1.0 if mn <= exp_val <= mx else 0.0
+                except Exception:
+                    pass
+            final_score = (
+                    CONFIG["scoring"].get("semantic_weight", 0.5) * rel_score +
+                    CONFIG["scoring"].get("skill_weight", 0.3) * skill_score +
+                    CONFIG["scoring"].get("experience_weight", 0.2) * exp_score
+            )
+            if CONFIG["filters"].get("enforce_must_have", True) and must_skills and skill_matches == 0:
+                continue
+            o = {"candidate": r, "semantic": sem_score, "skill_score": skill_score,
+                 "exp_score": exp_score, "final_score": final_score}
+            if fused is not None:
+                o["fused"] = rel_score
+            out.append(o)
+        out = sorted(out, key=lambda x: x["final_score"], reverse=True)
+    return out
+
+
+def _collapse_linked(out: list):
+    """Keep only the best-scoring member of each group of linked near-duplicates (out is sorted)."""
+    links = get_duplicate_links([o["candidate"]["id"] for o in out])
+    if not links:
+        return out
+    seen, kept = set(), []
+    for o in out:
+        root = links.get(o["candidate"]["id"], o["candidate"]["id"])
+        if root not in seen:
+            seen.add(root)
+            kept.append(o)
+    return kept
+
+
+def _response(query: str, out: list):
+    out = _collapse_linked(out) if out else out
+    if not out:
+        return {"query": query, "results": [], "message": NO_RESULTS}
+
+    max_score = max([o["final_score"] for o in out] or [1.0])
+    for o in out:
+        o["match_percent"] = round((o["final_score"] / max_score) * 100, 2)
+    return {"query": query, "results": out}
+
+
+def _vec_map(vec_results):
+    return {v["id"]: float(v.get("score", 0.0)) for v in vec_results or [] if isinstance(v, dict)}
+
+
+def fuse_scores(vec_results, lex_results):
+    """
+    Reciprocal rank fusion: w_sem / (k + rank_sem) + w_lex / (k + rank_lex), scaled so that
+    rank 1 in both lists scores 1.0 (keeps it comparable to a cosine in the final weighting).
+    """
+    fcfg = CONFIG["scoring"].get("fusion", {}) or {}
+    k = fcfg.get("rrf_k", 60)
+    w_sem, w_lex = fcfg.get("semantic_weight", 1.0), fcfg.get("lexical_weight", 1.0)
+    best = (w_sem + w_lex) / (k + 1) or 1.0
+    fused = {}
+    for rank, v in enumerate(vec_results or [], 1):
+        fused[v["id"]] = fused.get(v["id"], 0.0) + w_sem / (k + rank)
+    for rank, (cid, _) in enumerate(lex_results or [], 1):
+        fused[cid] = fused.get(cid, 0.0) + w_lex / (k + rank)
+    return {cid: s / best for cid, s in fused.items()}
+
+
+def _rank_in_shard(shard, query, parsed, vec_results, mode, rows_cache, limit=None):
+    where, params = build_filters(parsed)
+    if mode == "hybrid":
+        # the SQL filter only runs over the shortlist (vector top-k + FTS hits), inside SQLite
+        with timed("fts_search"):
+            lex_results = fts_search(query, limit=search_cfg().get("fts_shortlist", 200), shard=shard)
+        fused = fuse_scores(vec_results, lex_results)
+        with timed("sql_filter"):
+            rows = query_candidates(where, params, shard=shard, ids=list(fused))
+    else:
+        if (where, params) not in rows_cache:  # identical filters (common in a batch) hit SQLite once
+            with timed("sql_filter"):
+                rows_cache[(where, params)] = query_candidates(where, params, shard=shard)
+        rows, fused = rows_cache[(where, params)], None
+    ranked = rank_candidates(parsed, rows, _vec_map(vec_results), fused)
+    return ranked[:limit] if limit else ranked
+
+
+def _search_shard(shard, queries, parsed_all, qm, mode, artifacts_key=None):
+    """
+    Worker task: vector scan, SQL filter and rank one shard for every query (local top-k each).
+    Returns (rankings, stage metrics, shard counts): /metrics is served from the server process.
+    Rankings carry ids and scores only; the server fetches the rows that survive the merge.
+    """
+    parser_artifacts.sync(artifacts_key)  # pick up a reload done in the server process
+    top_k = search_cfg().get("vector_top_k", 50)
+    limit = search_cfg().get("max_results") or top_k
+    vec_all = search_vectors(qm, top_k, shard)
+    rows_cache = {}
+    ranked = []
+    for q, p, v in zip(queries, parsed_all, vec_all):
+        ranked.append([{"id": o.pop("candidate")["id"], **o}
+                       for o in _rank_in_shard(shard, q, p, v, mode, rows_cache, limit)])
+    return ranked, drain(), shard_counts(shard)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        workers = SHARD_CFG.get("workers") or min(SHARDS, os.cpu_count() or 1)
+        # spawn: workers start clean instead of forking a threaded server process
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _ranked(queries, parsed_all, mode):
+    """Yield each query's ranking in order. One shard runs inline, query by query; otherwise scatter-gather."""
+    qm = encode_queries(queries)
+    if SHARDS == 1:
+        vec_all = search_vectors(qm, search_cfg().get("vector_top_k", 50), 0)
+        rows_cache = {}
+        for q, p, v in zip(queries, parsed_all, vec_all):
+            yield _rank_in_shard(0, q, p, v, mode, rows_cache, search_cfg().get("max_results"))
+        return
+
+    # every chunk is queued up front; a chunk's queries are merged and yielded as soon as all shards finish it
+    chunk = SHARD_CFG.get("batch_chunk") or 16
+    key = parser_artifacts.current().key
+    pool = _get_pool()
+    pending = [[pool.submit(_search_shard, s, queries[i:i + chunk], parsed_all[i:i + chunk], qm[i:i + chunk],
+                            mode, key) for s in range(SHARDS)] for i in range(0, len(queries), chunk)]
+    limit = search_cfg().get("max_results")
+    try:
+        for futures in pending:
+            with timed("shard_gather"):
+                per_shard = []
+                for s, f in enumerate(futures):
+                    ranked, snap, counts = f.result()
+                    merge(snap)
+                    record_shard_counts(s, counts)
+                    per_shard.append(ranked)
+            for qi in range(len(per_shard[0])):
+                with timed("shard_merge"):
+                    merged = sorted((r for shard_out in per_shard for r in shard_out[qi]),
+                                    key=lambda x: x["final_score"], reverse=True)
+                    merged = merged[:limit] if limit else merged
+                    rows = get_candidates_by_ids([o["id"] for o in merged])
+                # a row deleted since its shard was ranked is dropped
+                yield [{"candidate": rows[o.pop("id")], **o} for o in merged if o["id"] in rows]
+    finally:
+        # a client that stops reading (disconnect) leaves nothing queued behind it
+        for futures in pending:
+            for f in futures:
+                f.cancel()
+
+
+def search_candidates(query: str, mode: str = None):
+    if not query or query.strip() == "":
+        return {"query": query, "results": [], "message": "Enter a valid query"}
+
+    mode = resolve_mode(mode)
+    parsed = parse_query(query)
+    return _response(query, next(_ranked([query], [parsed], mode)))
+
+
+# -------------------- Batch --------------------
+def job_query(job: dict) -> str:
+    """Turn a job spec into a recruiter-style query the parser understands."""
+    return f"{job.get('title', '')} {' '.join(job.get('skills', []))} in {job.get('location', '')}".strip()
+
+
+def batch_items(queries=None, job_ids=None, all_open_jobs=False):
+    """Build [{"query", "job_id"}] from free-text queries and/or job specs. Raises KeyError on unknown jobs."""
+    items = [{"query": q, "job_id": None} for q in (queries or []) if q and q.strip()]
+    jobs = list_open_jobs() if all_open_jobs else []
+    for jid in job_ids or []:
+        job = get_job(jid)
+        if not job:
+            raise KeyError(jid)
+        jobs.append(job)
+    seen = set()
+    for job in jobs:
+        if job["id"] not in seen:
+            seen.add(job["id"])
+            items.append({"query": job_query(job), "job_id": job["id"]})
+    return items
+
+
+def search_batch(items, mode: str = None):
+    """
+    Score many queries against the pool in one pass: all queries are parsed, encoded in one batch
+    and scored with one matrix product per shard (per sharding.batch_chunk queries when sharded);
+    per-query SQL filtering and ranking then yield one response per item, in order, as each finishes.
+    """
+    if not items:
+        return
+    mode = resolve_mode(mode)
+    queries = [it["query"] for it in items]
+    parsed_all = parse_queries(queries)
+    for it, ranked in zip(items, _ranked(queries, parsed_all, mode)):
+        res = _response(it["query"], ranked)
+        if it.get("job_id"):
+            res["job_id"] = it["job_id"]
+        yield res
@@ -0,0 +1,129 @@
+# services/tombstones.py
+# Candidate deletes. A delete only writes tombstones: deleted_at on the SQLite row (its FTS entry,
+# job match rows and near-duplicate postings are dropped right away) and the id in the shard's
+# tombstones.json, which search masks out of the score matrix. Nothing large is read or rewritten on
+# the request path; a background thread checks each shard's deleted fraction (SQLite row counts) and,
+# past compaction.threshold, rewrites its vectors/metadata files without the tombstoned ids and
+# purges the SQLite rows.
+import threading
+from datetime import datetime
+
+from config.config_loader import section
+from services.metrics import inc, timed
+from services.reindex import reindex_running
+from db.db import SHARDS, tombstone_candidate, purge_tombstones, count_tombstones, count_rows
+import chroma.chroma_store as store
+
+
+def _threshold():
+    return float(section("compaction").get("threshold", 0.2))
+
+
+def _min_tombstones():
+    return int(section("compaction").get("min_tombstones", 50))
+
+
+_lock = threading.Lock()
+_state = {"running": False, "last": None}
+
+
+def delete_candidate(candidate_id: str):
+    """Tombstone a candidate everywhere. Returns False if there is no live candidate with that id."""
+    with timed("delete"):
+        shard = tombstone_candidate(candidate_id)
+        if shard is None:
+            return False
+        store.tombstone_candidates([candidate_id], shard)
+    inc("candidates_deleted")
+    maybe_compact()
+    return True
+
+
+def delete_candidates(candidate_ids):
+    by_shard = {}
+    for cid in candidate_ids or []:
+        shard = tombstone_candidate(cid)
+        if shard is not None:
+            by_shard.setdefault(shard, []).append(cid)
+    for shard, ids in by_shard.items():
+        store.tombstone_candidates(ids, shard)
+    deleted = [cid for ids in by_shard.values() for cid in ids]
+    if deleted:
+        inc("candidates_deleted", len(deleted))
+        maybe_compact()
+    return deleted
+
+
+def shard_stats():
+    """Per-shard tombstone counts from SQLite (tombstoned vs live rows); no vector file is read."""
+    out = []
+    for s in range(SHARDS):
+        live, tombs = count_rows(s)
+        total = live + tombs
+        out.append({"shard": s, "tombstones": tombs, "deleted_fraction": round(tombs / total, 4) if total else 0.0})
+    return out
+
+
+def _due_shards():
+    threshold, min_tombstones = _threshold(), _min_tombstones()
+    return [st["shard"] for st in shard_stats()
+            if st["tombstones"] >= min_tombstones and st["deleted_fraction"] >= threshold]
+
+
+def compact(shards=None):
+    """Rewrite the given shards (default: all with tombstones) and purge their tombstoned rows."""
+    if reindex_running():
+        # purged rows would leave their vectors in the generation being built; retried after the swap
+        print("[COMPACT] deferred: re-embedding running")
+        return {"deferred": "re-embedding running", "shards": [], "vectors_dropped": 0, "rows_purged": 0}
+    cutoff = datetime.utcnow().isoformat()
+    report = {"shards": [], "vectors_dropped": 0, "rows_purged": 0}
+    with timed("compaction"):
+        for s in (range(SHARDS) if shards is None else shards):
+            dropped = store.compact_shard(s)
+            # only rows tombstoned before this run: their vectors are gone now
+            purged = purge_tombstones(s, before=cutoff)
+            report["shards"].append({"shard": s, "vectors_dropped": dropped, "rows_purged": purged})
+            report["vectors_dropped"] += dropped
+            report["rows_purged"] += purged
+    if report["vectors_dropped"] or report["rows_purged"]:
+        # refill job lists that lost deleted candidates
+        from services.job_matcher import rebuild_job_matches
+        rebuild_job_matches()
+    print(f"[COMPACT] dropped {report['vectors_dropped']} vectors, purged {report['rows_purged']} rows")
+    return report
+
+
+def start_compaction(shards=None, only_due: bool = False):
+    """
+    Run compact() in a background thread. With only_due the thread first picks the shards past the
+    threshold (and does nothing if there are none). Returns False if one is already running.
+    """
+    with _lock:
+        if _state["running"]:
+            return False
+        _state["running"] = True
+
+    def _run():
+        try:
+            targets = _due_shards() if only_due else shards
+            if targets is None or targets:
+                _state["last"] = compact(targets)
+        except Exception as e:
+            print(f"[COMPACT] failed: {e}")
+            _state["last"] = {"error": str(e)}
+        finally:
+            _state["running"] = False
+
+    threading.Thread(target=_run, name="compaction", daemon=True).start()
+    return True
+
+
+def maybe_compact():
+    """Called after deletes: the threshold check itself runs on the background thread."""
+    return start_compaction(only_due=True)
+
+
+def compaction_status():
+    return {"running": _state["running"], "threshold": _threshold(), "min_tombstones": _min_tombstones(),
+            "rows_tombstoned": count_tombstones(), "shards": shard_stats(), "last": _state["last"]}